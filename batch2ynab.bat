@@ -0,0 +1,14 @@
+@echo off
+setlocal
+
+REM Converts every BOC / BOC credit card / MPay statement matching the arguments to YNAB CSV.
+REM Usage: batch2ynab.bat [--out-dir DIR] [--jobs N] [--overwrite] [--ledger] <dir|glob|file> ...
+REM With no arguments the current directory is converted.
+REM This script simply calls the Python script batch2ynab.py with the provided arguments.
+
+if "%~1"=="" (
+    uv run "%~dp0batch2ynab.py" "%CD%"
+) else (
+    uv run "%~dp0batch2ynab.py" %*
+)
+exit /b %errorlevel%
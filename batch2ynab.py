@@ -0,0 +1,215 @@
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#   "pandas>=2.0,<3",
+#   "openpyxl>=3",
+#   "xlrd>=2.0.1",
+# ]
+# ///
+"""
+batch2ynab.py – Convert a whole folder of bank statements → YNAB-friendly CSVs
+
+Each input is matched to ``boc2ynab``, ``boccredit2ynab`` or ``mpay2ynab`` by
+its header row, and the files are converted in parallel with a process pool so
+the interpreter start-up and the pandas import are paid once per worker rather
+than once per statement. The CSV is written next to the statement
+(``statement.xlsx`` → ``statement.csv``) unless ``--out-dir`` is given.
+
+Nothing is ever asked interactively: existing CSVs are left alone unless
+``--overwrite`` is passed. The exit code is 1 if any file failed.
+
+With ``--incremental`` an :class:`~ynab_common.ExportIndex` (``--state``) is
+consulted: statements whose content was already exported are skipped without
+being opened, and only transactions no earlier statement produced are written.
+
+With ``--ledger`` every converted transaction is also appended to the
+:class:`~ynab_common.Ledger` (``--ledger-file``) that ``ynab_ledger.py`` queries.
+
+Usage
+-----
+python batch2ynab.py [--out-dir DIR] [--jobs N] [--overwrite] [--incremental [--state FILE]] [--ledger [--ledger-file FILE]] [--profile[=FILE]] <dir|glob|file> ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import boc2ynab
+import boccredit2ynab
+import instrument
+import mpay2ynab
+from instrument import stage
+from ynab_common import DEFAULT_LEDGER, ENGINES, ExportIndex, Ledger, file_digest, sniff
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────────────────────────────
+
+STATEMENT_SUFFIXES = {".xls", ".xlsx"}
+
+DEFAULT_STATE = Path.home() / ".batch2ynab.sqlite"
+
+CONVERTERS = {
+    "boc": boc2ynab.convert,
+    "boccredit": boccredit2ynab.convert,
+    "mpay": mpay2ynab.convert,
+}
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Helpers
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _expand_inputs(patterns: list[str]) -> list[Path]:
+    """Turn directories, globs and plain paths into a sorted list of statements."""
+    found: set[Path] = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.iterdir()
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        found.update(
+            p.resolve() for p in candidates
+            if p.is_file() and p.suffix.lower() in STATEMENT_SUFFIXES and not p.name.startswith("~$")
+        )
+    return sorted(found)
+
+
+def _convert_one(
+    infile: Path, outfile: Path, state: Path | None = None, digest: str = "", engine: str = "auto",
+    profiling: bool = False, ledger: Path | None = None,
+) -> tuple[str, int, float, dict | None]:
+    """Worker: sniff the layout of *infile*, convert it and time the run.
+
+    With a *state* file the conversion is incremental; if it fails, the
+    transaction keys it claimed are released again. With a *ledger* file the
+    transactions are appended to that :class:`~ynab_common.Ledger` as well.
+    The last item returned is the worker's stage timings when the run is
+    profiled.
+    """
+    instrument.start_worker(profiling)
+    start = time.perf_counter()
+    with stage("sniff"):
+        kind, sheet = sniff(infile)
+    book = Ledger(ledger) if ledger is not None else None
+    try:
+        if state is None:
+            rows = CONVERTERS[kind](str(infile), str(outfile), rows=sheet, engine=engine, ledger=book)
+        else:
+            with ExportIndex(state, statement=digest) as index:
+                try:
+                    rows = CONVERTERS[kind](str(infile), str(outfile), index=index, rows=sheet, engine=engine,
+                                            ledger=book)
+                    index.add_statement(infile)
+                except BaseException:
+                    index.forget()
+                    raise
+    finally:
+        if book is not None:
+            book.close()
+    return kind, rows, time.perf_counter() - start, instrument.take_stages() if profiling else None
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CLI wrapper
+# ──────────────────────────────────────────────────────────────────────────────
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert many bank statements to YNAB CSV in parallel.")
+    parser.add_argument("inputs", nargs="+", help="Statement files, directories or glob patterns")
+    parser.add_argument("-o", "--out-dir", type=Path, help="Write CSVs here instead of next to each statement")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--overwrite", action="store_true", help="Replace CSVs that already exist")
+    parser.add_argument("--engine", choices=ENGINES, default="auto",
+                        help="Force the pure-Python or the pandas conversion (default: by statement size)")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="Skip statements and transactions that were already exported")
+    parser.add_argument("--state", type=Path, default=DEFAULT_STATE,
+                        help=f"Export index used by --incremental (default: {DEFAULT_STATE})")
+    parser.add_argument("-l", "--ledger", action="store_true",
+                        help="Also append the transactions to the ledger queried by ynab_ledger.py")
+    parser.add_argument("--ledger-file", type=Path, default=DEFAULT_LEDGER,
+                        help=f"Ledger used by --ledger (default: {DEFAULT_LEDGER})")
+    instrument.setup(argv)
+    args = parser.parse_args(argv)
+
+    files = _expand_inputs(args.inputs)
+    if not files:
+        print("No .xls/.xlsx statements found.", file=sys.stderr)
+        return 1
+
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    digests: dict[Path, str] = {}
+    index = ExportIndex(args.state) if args.incremental else None
+
+    jobs: dict[Path, Path] = {}
+    skipped = failed = 0
+    for infile in files:
+        if index is not None:
+            with stage("digest"):
+                digests[infile] = file_digest(infile)
+            if index.has_statement(digests[infile]):
+                print(f"SKIP  {infile.name}: already exported")
+                skipped += 1
+                continue
+        outfile = (args.out_dir or infile.parent) / (infile.stem + ".csv")
+        if outfile in jobs.values():
+            print(f"FAIL  {infile.name}: another statement is already being written to {outfile}")
+            failed += 1
+            continue
+        if outfile.exists() and not args.overwrite:
+            print(f"SKIP  {infile.name}: {outfile} exists (use --overwrite)")
+            skipped += 1
+            continue
+        jobs[infile] = outfile
+
+    if index is not None:
+        index.close()
+        # The same content under two names only needs converting once.
+        first: dict[str, Path] = {}
+        for infile in list(jobs):
+            if digests[infile] in first:
+                print(f"SKIP  {infile.name}: same content as {first[digests[infile]].name}")
+                del jobs[infile]
+                skipped += 1
+            else:
+                first[digests[infile]] = infile
+
+    start = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(jobs)))) as pool:
+            state = args.state if args.incremental else None
+            futures = {
+                pool.submit(_convert_one, i, o, state, digests.get(i, ""), args.engine, instrument.enabled(),
+                            args.ledger_file if args.ledger else None): i
+                for i, o in jobs.items()
+            }
+            for fut in as_completed(futures):
+                infile = futures[fut]
+                try:
+                    kind, rows, seconds, stages = fut.result()
+                except Exception as exc:  # noqa: BLE001 – report and keep going
+                    failed += 1
+                    print(f"FAIL  {infile.name}: {type(exc).__name__}: {exc}")
+                else:
+                    instrument.merge_stages(stages)
+                    print(f"OK    {infile.name} [{kind}] → {jobs[infile]}: {rows} rows ({seconds:.2f} s)")
+
+    print(
+        f"Converted {len(files) - skipped - failed} of {len(files)} statements "
+        f"({skipped} skipped, {failed} failed) in {time.perf_counter() - start:.2f} s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#   "pandas>=2.0,<3",
+#   "openpyxl>=3",
+#   "xlrd>=2.0.1",
+#   "psutil; sys_platform == 'win32'",
+# ]
+# ///
+"""
+bench_ynab.py – Synthetic statements and a benchmark harness for the ``*2ynab.py`` converters
+
+``generate`` writes realistic xlsx files in each layout the converters expect:
+the BOC preamble rows above the '交易日期' header, credit-card amounts with a
+currency prefix in 新簽賬項/入賬款項, and MPay rows whose 分類 is drawn from
+``mpay2ynab.ALL_TYPES``. Files are cached in ``--data-dir`` so they are only
+built once per size.
+
+``run`` converts every statement in a fresh interpreter per converter, engine
+and size, and reports wall time, rows/sec, peak RSS and the time spent in each
+stage (read, normalise, write). Results are saved as JSON and two runs can be
+put side by side with ``compare``.
+
+Usage
+-----
+python bench_ynab.py generate [--sizes 10,1000,100000]
+python bench_ynab.py run [--sizes ...] [--converters boc,boccredit,mpay] [--engines python,pandas] [-o results.json]
+python bench_ynab.py compare old.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────────────────────────────
+
+CONVERTERS = {
+    "boc": "boc2ynab",
+    "boccredit": "boccredit2ynab",
+    "mpay": "mpay2ynab",
+}
+
+DEFAULT_SIZES = [10, 1_000, 100_000]
+MAX_ROWS = 1_000_000
+
+DEFAULT_DATA_DIR = Path("bench_data")
+
+PAYEES = ["新苗超級市場", "澳門電力", "Starbucks", "McDonald's", "澳門自來水", "來來超市", "Uber", "7-Eleven"]
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Statement generators
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _amount(rng: random.Random) -> str:
+    return f"{rng.randint(100, 2_000_000) / 100:,.2f}"
+
+
+def _write_boc(ws, rows: int, rng: random.Random) -> None:
+    ws.append(["中國銀行澳門分行 – 賬戶交易明細"])
+    ws.append(["賬號", "12-34-56-789012"])
+    ws.append(["查詢日期", "2020/01/01 - 2024/12/31"])
+    ws.append([])
+    ws.append(["交易日期", "對方帳戶名稱", "業務類型", "支出金額", "存入金額", "餘額", "備註"])
+    start = datetime(2020, 1, 1)
+    for i in range(rows):
+        outflow = rng.random() < 0.7
+        ws.append([
+            start + timedelta(minutes=37 * i),
+            rng.choice(PAYEES) if rng.random() < 0.9 else None,
+            rng.choice(["轉賬", "櫃員機提款", "網上銀行", "扣賬卡消費"]),
+            _amount(rng) if outflow else None,
+            None if outflow else _amount(rng),
+            _amount(rng),
+            f"REF{i:08d}" if rng.random() < 0.5 else None,
+        ])
+
+
+def _write_boccredit(ws, rows: int, rng: random.Random) -> None:
+    ws.append(["交易日期", "記賬日期", "記賬幣別", "卡號", "入賬款項", "新簽賬項", "交易描述", "交易幣種", "交易金額"])
+    start = datetime(2020, 1, 1)
+    for i in range(rows):
+        day = start + timedelta(minutes=53 * i)
+        currency = rng.choice(["MOP", "MOP", "MOP", "HKD", "USD"])
+        amount = f"{currency} {_amount(rng)}"
+        refund = rng.random() < 0.05
+        ws.append([
+            day, day + timedelta(days=1), "MOP", "5XXX-XXXX-XXXX-1234",
+            amount if refund else None, None if refund else amount,
+            rng.choice(PAYEES), currency, amount,
+        ])
+
+
+def _write_mpay(ws, rows: int, rng: random.Random) -> None:
+    from mpay2ynab import ALL_TYPES
+
+    types = sorted(ALL_TYPES)
+    ws.append(["交易時間", "項目名稱", "交易編號", "分類", "對方賬號", "金額", "餘額/快捷支付"])
+    start = datetime(2020, 1, 1)
+    for i in range(rows):
+        ws.append([
+            (start + timedelta(minutes=41 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choice(PAYEES),
+            f"MP{20200101000000 + i}",
+            rng.choice(types),
+            f"853{rng.randint(60000000, 69999999)}" if rng.random() < 0.3 else None,
+            _amount(rng),
+            "快捷支付" if rng.random() < 0.1 else "餘額",
+        ])
+
+
+GENERATORS = {
+    "boc": _write_boc,
+    "boccredit": _write_boccredit,
+    "mpay": _write_mpay,
+}
+
+
+def statement_path(data_dir: Path, kind: str, rows: int) -> Path:
+    return data_dir / f"{kind}-{rows}.xlsx"
+
+
+def generate(data_dir: Path, kind: str, rows: int, force: bool = False) -> Path:
+    """Write a synthetic *kind* statement with *rows* transactions (cached)."""
+    import openpyxl
+
+    if not 1 <= rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS:,}")
+    path = statement_path(data_dir, kind, rows)
+    if path.exists() and not force:
+        return path
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    wb = openpyxl.Workbook(write_only=True)
+    GENERATORS[kind](wb.create_sheet(), rows, random.Random(f"{kind}-{rows}"))
+    tmp = path.with_suffix(".tmp")
+    wb.save(tmp)
+    tmp.replace(path)
+    return path
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Measurement (runs inside a fresh interpreter per case)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _measure(kind: str, engine: str, infile: str, outfile: str) -> dict:
+    start = time.perf_counter()
+    import importlib
+
+    import instrument
+
+    mod = importlib.import_module(CONVERTERS[kind])
+    if engine != "python":
+        import pandas  # noqa: F401 – count the import as start-up, not conversion
+    startup = time.perf_counter() - start
+
+    # The converters mark their own read / normalise / index / write stages
+    instrument.enable()
+    start = time.perf_counter()
+    rows = mod.convert(infile, outfile, engine=engine)
+    wall = time.perf_counter() - start
+    stages = instrument.take_stages()
+
+    read, write = (stages.get(name, {}).get("seconds", 0.0) for name in ("read", "write"))
+    return {
+        "startup": startup,
+        "wall": wall,
+        "rows_out": rows,
+        "read": read,
+        "normalise": max(0.0, wall - read - write),
+        "write": write,
+        "peak_rss_mb": instrument.peak_rss_mb(),
+    }
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Harness
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run(args: argparse.Namespace) -> int:
+    results = []
+    for size in args.sizes:
+        for kind in args.converters:
+            infile = generate(args.data_dir, kind, size)
+            outfile = infile.with_suffix(".csv")
+            for engine in args.engines:
+                proc = subprocess.run(
+                    [sys.executable, __file__, "_case", kind, engine, str(infile), str(outfile)],
+                    capture_output=True, text=True,
+                )
+                if proc.returncode:
+                    print(f"{kind:<10} {engine:<7} {size:>9,}  FAILED\n{proc.stderr}", file=sys.stderr)
+                    return 1
+                m = json.loads(proc.stdout)
+                m.update(converter=kind, engine=engine, rows=size, rows_per_sec=size / m["wall"])
+                results.append(m)
+                print(
+                    f"{kind:<10} {engine:<7} {size:>9,} rows  {m['wall']:8.3f} s  "
+                    f"{m['rows_per_sec']:>11,.0f} rows/s  {m['peak_rss_mb']:7.1f} MB  "
+                    f"startup {m['startup']:.3f}  read {m['read']:.3f}  "
+                    f"normalise {m['normalise']:.3f}  write {m['write']:.3f}"
+                )
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = args.output or Path(f"bench_ynab-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Saved results to {output}")
+    return 0
+
+
+def compare(old_path: Path, new_path: Path) -> int:
+    def load(path: Path) -> dict:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return {(r["converter"], r["engine"], r["rows"]): r for r in data["results"]}
+
+    old, new = load(old_path), load(new_path)
+    print(f"{'case':<32} {'old s':>9} {'new s':>9} {'speed-up':>9} {'old MB':>8} {'new MB':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        o, n = old[key], new[key]
+        print(
+            f"{' '.join(map(str, key)):<32} {o['wall']:9.3f} {n['wall']:9.3f} "
+            f"{o['wall'] / n['wall']:8.2f}x {o['peak_rss_mb']:8.1f} {n['peak_rss_mb']:8.1f}"
+        )
+    return 0
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CLI wrapper
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _csv_list(convert):
+    return lambda text: [convert(v) for v in text.split(",") if v]
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_case"]:  # child process started by ``run``
+        kind, engine, infile, outfile = argv[1:]
+        print(json.dumps(_measure(kind, engine, infile, outfile)))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark the *2ynab converters on synthetic statements.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--sizes", type=_csv_list(int), default=DEFAULT_SIZES,
+                        help=f"Comma-separated row counts, up to {MAX_ROWS:,} (default: 10,1000,100000)")
+    common.add_argument("--converters", type=_csv_list(str), default=list(CONVERTERS),
+                        help="Comma-separated subset of boc,boccredit,mpay")
+    common.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Where generated statements are kept")
+
+    gen = sub.add_parser("generate", parents=[common], help="Write synthetic statements")
+    gen.add_argument("--force", action="store_true", help="Rebuild files that already exist")
+
+    bench = sub.add_parser("run", parents=[common], help="Run the benchmarks")
+    bench.add_argument("--engines", type=_csv_list(str), default=["python", "pandas"],
+                       help="Comma-separated subset of python,pandas,auto")
+    bench.add_argument("-o", "--output", type=Path, help="Results file (default: bench_ynab-<timestamp>.json)")
+
+    cmp = sub.add_parser("compare", help="Compare two results files")
+    cmp.add_argument("old", type=Path)
+    cmp.add_argument("new", type=Path)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return compare(args.old, args.new)
+
+    unknown = set(args.converters) - CONVERTERS.keys()
+    if unknown:
+        parser.error(f"unknown converter(s): {', '.join(sorted(unknown))}")
+
+    if args.command == "generate":
+        for size in args.sizes:
+            for kind in args.converters:
+                start = time.perf_counter()
+                path = generate(args.data_dir, kind, size, force=args.force)
+                print(f"{path} ({time.perf_counter() - start:.2f} s)")
+        return 0
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,44 +14,49 @@ The xlsx file can be downloaded from https://its.bocmacau.com/prelogin.do?_local
 
 Usage
 -----
-    python boc2ynab.py statement.xlsx output.csv
+    python boc2ynab.py statement.xlsx output.csv [--ledger[=FILE]] [--profile[=FILE]]
+
+``--ledger`` also appends the transactions to the ledger (see ``ynab_ledger.py``).
 """
 
 from __future__ import annotations
 
 import sys
-from datetime import datetime
-import pandas as pd
-
-
-def _find_header_row(raw: pd.DataFrame) -> int:
-    """Return the index of the row whose first cell is '交易日期'."""
-    for i, val in enumerate(raw.iloc[:, 0]):
-        if str(val).strip() == "交易日期":
-            return i
-    raise RuntimeError("Header row with '交易日期' not found.")
-
-
-def _normalise_date(val) -> str:
-    """Convert date-like values to MM/DD/YYYY; otherwise return blank."""
-    if pd.isna(val):
-        return ""
-    if isinstance(val, datetime):
-        return val.strftime("%m/%d/%Y")
-    try:
-        return pd.to_datetime(val).strftime("%m/%d/%Y")
-    except Exception:  # noqa: BLE001
-        return str(val)
-
-
-def convert(infile: str, outfile: str) -> None:
-    # Pass 1 – locate the header row.
-    raw = pd.read_excel(infile, header=None, dtype=str)
-    header_row = _find_header_row(raw)
-
-    # Pass 2 – re-read with the proper header.
-    df = pd.read_excel(infile, header=header_row, dtype=str)
-
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import instrument
+from instrument import stage, timed
+from ynab_common import (
+    ExportIndex,
+    Ledger,
+    Row,
+    YNAB_COLUMNS,
+    account_number,
+    find_header,
+    getter,
+    iter_records,
+    iter_rows,
+    normalise_amount,
+    normalise_amounts,
+    normalise_date,
+    normalise_dates,
+    pick_engine,
+    pop_ledger_option,
+    read_frames,
+    record_keys,
+    transaction_keys,
+    write_csv,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Rows are handed to pandas in blocks of this size so that memory stays flat
+# no matter how many years of transactions the statement covers.
+CHUNK_ROWS = 50_000
+
+
+def _transform(df: pd.DataFrame) -> pd.DataFrame:
     # Chinese → YNAB column names.
     col_map = {
         "交易日期": "Date",
@@ -67,15 +72,101 @@ def convert(infile: str, outfile: str) -> None:
     df = df.reindex(columns=["Date", "Payee", "Memo", "Memo_alt", "Outflow", "Inflow"])
     df["Memo"] = df["Memo"].fillna(df["Memo_alt"]).fillna("")
 
-    df["Date"] = df["Date"].apply(_normalise_date)
+    df["Date"] = normalise_dates(df["Date"])
     for col in ("Outflow", "Inflow"):
-        df[col] = df[col].str.replace(",", "", regex=False).fillna("")
-
-    df[["Date", "Payee", "Memo", "Outflow", "Inflow"]].to_csv(outfile, index=False)
+        df[col] = normalise_amounts(df[col])
+
+    return df[YNAB_COLUMNS]
+
+
+def _transform_records(columns: list[str], records: Iterable[Row]) -> Iterator[list[str | None]]:
+    """Pure-Python :func:`_transform` for small statements."""
+    date = getter(columns, "交易日期", required=False)
+    payee = getter(columns, "對方帳戶名稱", required=False)
+    memo = getter(columns, "備註", required=False)
+    memo_alt = getter(columns, "業務類型", required=False)
+    outflow = getter(columns, "支出金額", required=False)
+    inflow = getter(columns, "存入金額", required=False)
+
+    for r in records:
+        m = memo(r)
+        if m is None:
+            m = memo_alt(r)
+        yield [
+            normalise_date(date(r)),
+            payee(r),
+            "" if m is None else m,
+            normalise_amount(outflow(r)),
+            normalise_amount(inflow(r)),
+        ]
+
+
+def convert(
+    infile: str,
+    outfile: str,
+    index: ExportIndex | None = None,
+    rows: Iterable[Row] | None = None,
+    engine: str = "auto",
+    ledger: Ledger | None = None,
+) -> int:
+    """Convert *infile* to *outfile* and return the number of rows written.
+
+    With an *index*, rows already exported from an earlier (overlapping)
+    statement are left out. With a *ledger*, every converted row is also
+    appended to it (the ledger skips rows it already has). *rows* may carry the rows of *infile* already
+    obtained from :func:`ynab_common.sniff`. *engine* is ``"auto"`` (pandas
+    only for large statements), ``"python"`` or ``"pandas"``.
+    """
+    rows = timed("read", iter_rows(infile) if rows is None else rows)
+    preamble: list[Row] = []
+    columns = find_header("boc", rows, preamble)
+    # Rows are indexed and kept per account, so two accounts' identical rows both count.
+    number = account_number(preamble)
+    account = f"boc:{number}" if number else "boc"
+    engine, records = pick_engine(iter_records(rows, len(columns)), engine)
+
+    if engine == "python":
+        with stage("normalise"):
+            out = list(_transform_records(columns, records))
+        if ledger is not None:
+            with stage("ledger"):
+                ledger.append(account, out)
+        if index is not None:
+            with stage("index"):
+                out = [r for r, new in zip(out, index.claim(account, record_keys(out))) if new]
+        with stage("write"):
+            write_csv(outfile, out)
+        return len(out)
+
+    carry: dict[str, int] = {}
+    written = 0
+    # Single pass – stream rows and convert block by block.
+    with open(outfile, "w", encoding="utf-8", newline="") as fh:
+        for i, chunk in enumerate(timed("read", read_frames(columns, records, CHUNK_ROWS))):
+            with stage("normalise"):
+                out = _transform(chunk)
+            if index is not None or ledger is not None:
+                keys = transaction_keys(out, carry)
+            if ledger is not None:
+                with stage("ledger"):
+                    ledger.append(account, out.itertuples(index=False, name=None), keys)
+            if index is not None:
+                with stage("index"):
+                    out = out.loc[index.claim(account, keys)]
+            with stage("write"):
+                out.to_csv(fh, index=False, header=i == 0)
+            written += len(out)
+    return written
 
 
 if __name__ == "__main__":
+    instrument.setup()
+    ledger = pop_ledger_option(sys.argv)
     if len(sys.argv) != 3:
-        print("Usage: xls2ynab.py <input.xlsx> <output.csv>")
+        print("Usage: xls2ynab.py <input.xlsx> <output.csv> [--ledger[=FILE]]")
         sys.exit(1)
-    convert(sys.argv[1], sys.argv[2])
+    try:
+        convert(sys.argv[1], sys.argv[2], ledger=ledger)
+    finally:
+        if ledger is not None:
+            ledger.close()
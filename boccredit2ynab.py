@@ -14,67 +14,151 @@ This handles sheets with columns:
 
 Usage
 -----
-python boccredit2ynab.py input.xlsx output.csv
+python boccredit2ynab.py input.xlsx output.csv [--ledger[=FILE]] [--profile[=FILE]]
+
+``--ledger`` also appends the transactions to the ledger (see ``ynab_ledger.py``).
 """
+from __future__ import annotations
+
 import sys
 from pathlib import Path
-from datetime import datetime
-
-import pandas as pd
-
-def _normalise_date(value) -> str:
-    if pd.isna(value):
-        return ""
-    if isinstance(value, datetime):
-        return value.strftime("%m/%d/%Y")
-    try:
-        return pd.to_datetime(value).strftime("%m/%d/%Y")
-    except (ValueError, TypeError):
-        return str(value)
-
-
-def convert(infile: str | Path, outfile: str | Path) -> None:
-    # 1) read and rename
-    df = (
-        pd.read_excel(infile, header=0, dtype=str)
-          .rename(columns={
-              "交易日期":   "Date",
-              "交易描述":   "Payee",
-              "卡號":       "Memo",       # shove card-number into Memo
-              "入賬款項":   "InflowRaw",  # will parse into Inflow
-              "新簽賬項":   "OutflowRaw", # will parse into Outflow
-          })
-    )
-
-    # 2) normalize Date
-    df["Date"] = df["Date"].apply(_normalise_date)
-
-    # 3) strip currency code and commas, split off numeric part
-    def _num(x: str) -> str:
-        if pd.isna(x) or not x.strip():
-            return ""
-        # e.g. "USD 1,234.56" → "1,234.56"
-        parts = x.strip().split()  # split on whitespace
-        num = parts[-1]            # take last token
-        return num.replace(",", "")
-
-    df["Inflow"]  = df["InflowRaw"].apply(_num)
-    df["Outflow"] = df["OutflowRaw"].apply(_num)
-
-    # 4) select and write
-    df.loc[:, ["Date", "Payee", "Memo", "Outflow", "Inflow"]] \
-      .to_csv(outfile, index=False)
+from typing import Iterable
+
+import instrument
+from instrument import stage, timed
+from ynab_common import (
+    ExportIndex,
+    Ledger,
+    Row,
+    YNAB_COLUMNS,
+    find_header,
+    getter,
+    iter_records,
+    iter_rows,
+    normalise_amount,
+    normalise_amounts,
+    normalise_date,
+    normalise_dates,
+    pick_engine,
+    pop_ledger_option,
+    read_frame,
+    record_keys,
+    transaction_keys,
+    write_csv,
+)
+
+
+def _convert_records(columns: list[str], records: Iterable[Row]) -> list[list[str | None]]:
+    """Pure-Python conversion for small statements; same output as the pandas path."""
+    date = getter(columns, "交易日期")
+    payee = getter(columns, "交易描述")
+    memo = getter(columns, "卡號")
+    inflow = getter(columns, "入賬款項")
+    outflow = getter(columns, "新簽賬項")
+    return [
+        [
+            normalise_date(date(r)),
+            payee(r),
+            memo(r),
+            normalise_amount(outflow(r), strip_currency=True),
+            normalise_amount(inflow(r), strip_currency=True),
+        ]
+        for r in records
+    ]
+
+
+def _append_by_card(ledger: Ledger, rows: Iterable, keys: Iterable[str]) -> None:
+    """Add *rows* to *ledger* under one account per card number (Memo)."""
+    cards: dict[str, tuple[list, list[str]]] = {}
+    for row, key in zip(rows, keys):
+        card = row[2] if isinstance(row[2], str) and row[2] else ""
+        batch = cards.setdefault(card, ([], []))
+        batch[0].append(row)
+        batch[1].append(key)
+    for card, (batch_rows, batch_keys) in cards.items():
+        ledger.append(f"boccredit:{card}" if card else "boccredit", batch_rows, batch_keys)
+
+
+def convert(
+    infile: str | Path,
+    outfile: str | Path,
+    index: ExportIndex | None = None,
+    rows: Iterable[Row] | None = None,
+    engine: str = "auto",
+    ledger: Ledger | None = None,
+) -> int:
+    # 1) read (reusing rows already sniffed, if any); small files skip pandas
+    rows = timed("read", iter_rows(infile) if rows is None else rows)
+    columns = find_header("boccredit", rows)
+    engine, records = pick_engine(iter_records(rows, len(columns)), engine)
+
+    if engine == "python":
+        with stage("normalise"):
+            out = _convert_records(columns, records)
+        # A statement can list several cards, so the card number (Memo) is part of each key.
+        keys = record_keys(out, memo=True)
+        if ledger is not None:
+            with stage("ledger"):
+                _append_by_card(ledger, out, keys)
+        if index is not None:
+            with stage("index"):
+                out = [r for r, new in zip(out, index.claim("boccredit", keys)) if new]
+        with stage("write"):
+            write_csv(outfile, out)
+        return len(out)
+
+    with stage("read"):
+        df = (
+            read_frame(columns, records)
+              .rename(columns={
+                  "交易日期":   "Date",
+                  "交易描述":   "Payee",
+                  "卡號":       "Memo",       # shove card-number into Memo
+                  "入賬款項":   "InflowRaw",  # will parse into Inflow
+                  "新簽賬項":   "OutflowRaw", # will parse into Outflow
+              })
+        )
+
+    with stage("normalise"):
+        # 2) normalize Date
+        df["Date"] = normalise_dates(df["Date"])
+
+        # 3) strip currency code and commas, e.g. "USD 1,234.56" → "1234.56"
+        df["Inflow"]  = normalise_amounts(df["InflowRaw"], strip_currency=True)
+        df["Outflow"] = normalise_amounts(df["OutflowRaw"], strip_currency=True)
+
+    # 4) keep every row in the ledger, drop rows an earlier statement already exported
+    df = df.loc[:, YNAB_COLUMNS]
+    if index is not None or ledger is not None:
+        keys = transaction_keys(df, memo=True)
+    if ledger is not None:
+        with stage("ledger"):
+            _append_by_card(ledger, df.itertuples(index=False, name=None), keys)
+    if index is not None:
+        with stage("index"):
+            df = df.loc[index.claim("boccredit", keys)]
+
+    # 5) write
+    with stage("write"):
+        df.to_csv(outfile, index=False)
+    return len(df)
 
 
 def _usage():
-    print("Usage: boccredit2ynab.py <input.xlsx> <output.csv>", file=sys.stderr)
+    print("Usage: boccredit2ynab.py <input.xlsx> <output.csv> [--ledger[=FILE]]", file=sys.stderr)
     sys.exit(1)
 
 
 def main():
+    instrument.setup()
+    ledger = pop_ledger_option(sys.argv)
     if len(sys.argv) != 3:
         _usage()
-    convert(sys.argv[1], sys.argv[2])
+    try:
+        convert(sys.argv[1], sys.argv[2], ledger=ledger)
+    finally:
+        if ledger is not None:
+            ledger.close()
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ set SCRIPT_DIR=%~dp0
 
 rem If no argument is provided
 if "%~1"=="" (
-    echo Usage: compress_video.bat ^<input_file^>
+    echo Usage: compress_video.bat ^<input_file_or_folder^> [more ...] [-s size_mb] [-j jobs]
 ) else (
-    python "%SCRIPT_DIR%compress_video.py" "%~1"
+    python "%SCRIPT_DIR%compress_video.py" %*
 )
@@ -5,43 +5,177 @@
 # requires-python = ">=3.9"
 # ///
 
+from __future__ import annotations
+
 import sys
 import subprocess
 import os
 import argparse
+import json
+import sqlite3
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable
 
-startTime: float = time.time()
+import instrument
+from instrument import stage
 
-parser: argparse.ArgumentParser = argparse.ArgumentParser()
-parser.add_argument('-f', '--file', help='File to Crush', required=True)
-parser.add_argument('-o', '--output', help='Output File', required=False)
-parser.add_argument("-s", "--size", help="Target Size in MB", type=int, default=8)
-parser.add_argument("-t", "--tolerance", help="Tolerance", type=int, default=10)
-args: argparse.Namespace = parser.parse_args()
+VIDEO_EXTENSIONS: set[str] = {'.mp4', '.mkv', '.mov', '.webm', '.avi', '.m4v', '.wmv', '.flv'}
 
+# In batch mode every concurrent encode gets at least this many threads.
+MIN_THREADS_PER_JOB: int = 2
 
-def get_duration(fileInput: str) -> float:
-    return float(
-        subprocess.check_output([
+# Before the first full encode, a few short clips spread over the video are
+# encoded to learn how far the encoder's output drifts from the requested
+# bitrate. Videos shorter than SAMPLE_MIN_DURATION are encoded directly.
+SAMPLE_COUNT: int = 3
+SAMPLE_SECONDS: float = 5
+SAMPLE_MIN_DURATION: float = 60
+
+# Probe results and the encoder's achieved/requested bitrate ratio per
+# codec/resolution bucket survive between runs here, so unchanged files are
+# not probed again and the first attempt starts from a learned bitrate.
+DEFAULT_CACHE: str = os.path.join(os.path.expanduser('~'), '.compress_video.sqlite')
+# Heights are rounded up to the nearest of these rungs when bucketing.
+HEIGHT_RUNGS: tuple[int, ...] = (240, 360, 480, 720, 1080, 1440, 2160, 4320)
+# The stored ratio is a running mean over at most this many encodes, so it
+# keeps following the encoder if its behaviour drifts.
+RATIO_WINDOW: int = 10
+
+_CACHE_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS probes (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    codec    TEXT NOT NULL,
+    width    INTEGER NOT NULL,
+    height   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ratios (
+    bucket  TEXT PRIMARY KEY,
+    ratio   REAL NOT NULL,
+    samples INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class Probe:
+    duration: float
+    codec: str
+    width: int
+    height: int
+
+    @property
+    def bucket(self) -> str:
+        """Codec/resolution class whose encodes behave alike, e.g. ``h264/1080p``."""
+        rung: int = next((r for r in HEIGHT_RUNGS if self.height <= r), HEIGHT_RUNGS[-1])
+        return f'{self.codec}/{rung}p'
+
+
+def probe(fileInput: str) -> Probe:
+    """Read the duration and the first video stream's codec and size with one ffprobe call."""
+    with stage('ffprobe'):
+        info: dict = json.loads(subprocess.check_output([
             "ffprobe",
             "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
+            "-select_streams", "v:0",
+            "-show_entries", "format=duration:stream=codec_name,width,height",
+            "-of", "json",
             fileInput
-        ])[:-1]
+        ]))
+    stream: dict = (info.get('streams') or [{}])[0]
+    return Probe(
+        float(info['format']['duration']),
+        stream.get('codec_name', 'unknown'),
+        int(stream.get('width') or 0),
+        int(stream.get('height') or 0),
     )
 
 
-def transcode(fileInput: str, fileOutput: str, bitrate: int) -> None:
+def get_duration(fileInput: str) -> float:
+    return probe(fileInput).duration
+
+
+class CrushCache:
+    """SQLite store of probe results and learned bitrate ratios.
+
+    Probes are keyed by path and stay valid while the file's size and mtime
+    are unchanged. One instance may be shared by the threads of a batch run.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(_CACHE_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> CrushCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def probe(self, fileInput: str) -> Probe:
+        """Return the cached probe of *fileInput*, running ffprobe only if the file changed."""
+        path: str = os.path.abspath(fileInput)
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT duration, codec, width, height FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        if row:
+            return Probe(*row)
+        result: Probe = probe(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, result.duration, result.codec, result.width, result.height),
+            )
+        return result
+
+    def ratio(self, bucket: str) -> float | None:
+        """Return the mean achieved/requested bitrate ratio seen for *bucket*, if any."""
+        with self._lock:
+            row = self._conn.execute("SELECT ratio FROM ratios WHERE bucket = ?", (bucket,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, bucket: str, ratio: float) -> None:
+        """Fold one encode's achieved/requested bitrate *ratio* into *bucket*'s running mean."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ratios (bucket, ratio, samples) VALUES (?, ?, 1)
+                ON CONFLICT (bucket) DO UPDATE SET
+                    ratio = (ratio * samples + excluded.ratio) / (samples + 1),
+                    samples = MIN(samples + 1, ?)
+                """,
+                (bucket, ratio, RATIO_WINDOW),
+            )
+
+
+def transcode(
+    fileInput: str, fileOutput: str, bitrate: int, start: float = 0, length: float = 0, threads: int = 0
+) -> None:
+    seek: list[str] = ['-ss', str(start), '-t', str(length)] if length else []
+    threadArgs: list[str] = ['-threads', str(threads)] if threads else []
     command: list[str] = [
         'ffmpeg',
         '-y',
         '-hide_banner',
         '-loglevel', 'error',
+        *seek,
         '-i', fileInput,
         '-b', str(bitrate) + '',
         '-cpu-used', str(os.cpu_count()),
+        *threadArgs,
         '-c:a',
         'copy',
         fileOutput
@@ -53,38 +187,377 @@ def transcode(fileInput: str, fileOutput: str, bitrate: int) -> None:
         # avoid having to explicitly encode
         text=True
     )
+    if proc.returncode != 0:
+        # A failed encode would otherwise leave an empty or truncated output
+        # behind and be measured as if it were a result.
+        raise subprocess.CalledProcessError(proc.returncode, command, proc.stdout, proc.stderr)
+
+
+def split_at_keyframes(fileInput: str, workDir: str, chunks: int, durationSeconds: float) -> list[str]:
+    """Cut *fileInput* into about *chunks* segments without re-encoding.
+
+    The segment muxer only cuts on keyframes, so every segment can be encoded
+    on its own and the results joined losslessly again.
+    """
+    ext: str = fileInput[fileInput.rindex('.'):]
+    with stage('split'):
+        subprocess.run([
+            'ffmpeg',
+            '-y',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-i', fileInput,
+            '-map', '0',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(durationSeconds / chunks),
+            '-reset_timestamps', '1',
+            os.path.join(workDir, 'segment%03d' + ext)
+        ], check=True)
+    return sorted(
+        os.path.join(workDir, name) for name in os.listdir(workDir) if name.startswith('segment')
+    )
+
+
+def transcode_chunked(segments: list[str], fileOutput: str, bitrate: int, workDir: str, threads: int = 0) -> None:
+    """Encode *segments* concurrently at *bitrate* and concatenate them into *fileOutput*.
+
+    Each segment spends the same bitrate over its own duration, so together
+    they use the budget of the whole video. The *threads* budget (all cores
+    by default) is split evenly between the concurrent encoders.
+    """
+    ext: str = fileOutput[fileOutput.rindex('.'):]
+    encoded: list[str] = [os.path.join(workDir, f'encoded{i:03d}{ext}') for i in range(len(segments))]
+    threads = max(1, (threads or os.cpu_count() or 1) // len(segments))
+    with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+        list(pool.map(lambda pair: transcode(pair[0], pair[1], bitrate, threads=threads), zip(segments, encoded)))
+
+    listFile: str = os.path.join(workDir, 'concat.txt')
+    with open(listFile, 'w', encoding='utf-8') as fh:
+        for path in encoded:
+            fh.write("file '" + path.replace("'", "'\\''") + "'\n")
+    with stage('concat'):
+        subprocess.run([
+            'ffmpeg',
+            '-y',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', listFile,
+            '-c', 'copy',
+            fileOutput
+        ], check=True)
+
+
+def sample_size_model(
+    fileInput: str, durationSeconds: float, bitrate: int, threads: int = 0
+) -> tuple[float, float] | None:
+    """Fit ``size = intercept + slope * bitrate`` from short sample encodes.
+
+    The samples are encoded at *bitrate* and at half of it, and their sizes are
+    scaled up to the full duration. The intercept absorbs what does not depend
+    on the video bitrate (the copied audio track, container overhead).
+    Returns ``None`` when the video is too short for sampling to pay off.
+    """
+    if durationSeconds < SAMPLE_MIN_DURATION:
+        return None
+
+    ext: str = fileInput[fileInput.rindex('.'):]
+    step: float = durationSeconds / (SAMPLE_COUNT + 1)
+    points: list[tuple[int, float]] = []
+    for sampleBitrate in (bitrate, max(1, bitrate // 2)):
+        sampleBytes: int = 0
+        for i in range(1, SAMPLE_COUNT + 1):
+            fd, samplePath = tempfile.mkstemp(suffix=ext)
+            os.close(fd)
+            try:
+                transcode(fileInput, samplePath, sampleBitrate,
+                          start=step * i - SAMPLE_SECONDS / 2, length=SAMPLE_SECONDS, threads=threads)
+                sampleBytes += os.stat(samplePath).st_size
+            finally:
+                os.remove(samplePath)
+        points.append((sampleBitrate, sampleBytes * durationSeconds / (SAMPLE_COUNT * SAMPLE_SECONDS)))
+
+    (b1, s1), (b0, s0) = points
+    if b1 == b0 or s1 <= s0:
+        return None
+    slope: float = (s1 - s0) / (b1 - b0)
+    return s0 - slope * b0, slope
 
 
-tolerance: int = args.tolerance
-fileInput: str = args.file
-if args.output:
-    fileOutput: str = args.output
-else:
-    fileOutput: str = fileInput[:fileInput.rindex('.')] + '.crushed' + fileInput[fileInput.rindex('.'):]
-targetSizeKilobytes: int = args.size * 1024
-targetSizeBytes: int = targetSizeKilobytes * 1024
-durationSeconds: float = get_duration(fileInput)
-bitrate: int = round(targetSizeBytes / durationSeconds)
-beforeSizeBytes: int = os.stat(fileInput).st_size
-
-print(f"Crushing {fileInput} to {targetSizeKilobytes} KB with tolerance {tolerance}%")
-
-factor: float = 0
-attempt: int = 0
-while (factor > 1.0 + (tolerance / 100)) or (factor < 1):
-    attempt = attempt + 1
-    bitrate = round(bitrate * (factor or 1))
-    print(f"Attempt {attempt}: Transcoding {fileInput} at bitrate {bitrate}")
-
-    transcode(fileInput, fileOutput, bitrate)
-    afterSizeBytes: int = os.stat(fileOutput).st_size
-    percentOfTarget: float = (100 / targetSizeBytes) * afterSizeBytes
-    factor = 100 / percentOfTarget
+def next_bitrate(history: list[tuple[int, int]], goalBytes: float, slope: float | None = None) -> int:
+    """Pick the next bitrate from the (bitrate, size) pairs tried so far.
+
+    Uses the secant through the last two attempts (size grows roughly linearly
+    with bitrate). After the first attempt the sampled *slope* is used, or
+    simple scaling without one. The guess never leaves the bracket of
+    bitrates known to be too small or too large.
+    """
+    bitrate, size = history[-1]
+    guess: float = bitrate * goalBytes / size
+    if slope:
+        guess = bitrate + (goalBytes - size) / slope
+    if len(history) >= 2:
+        prevBitrate, prevSize = history[-2]
+        if size != prevSize:
+            guess = bitrate + (goalBytes - size) * (bitrate - prevBitrate) / (size - prevSize)
+
+    tooSmall: list[int] = [b for b, s in history if s < goalBytes]
+    tooLarge: list[int] = [b for b, s in history if s > goalBytes]
+    low: float = max(tooSmall, default=0)
+    high: float = min(tooLarge, default=float('inf'))
+    if not low < guess < high:
+        # Secant overshot the bracket: bisect instead.
+        guess = (low + high) / 2 if high != float('inf') else bitrate * goalBytes / size
+    return max(1, round(guess))
+
+
+@dataclass
+class CrushResult:
+    fileInput: str
+    fileOutput: str
+    durationSeconds: float
+    beforeSizeBytes: int
+    afterSizeBytes: int
+    attempts: int
+    seconds: float
+
+
+def crush(
+    fileInput: str,
+    fileOutput: str | None = None,
+    size: int = 8,
+    tolerance: int = 10,
+    chunks: int = 1,
+    threads: int = 0,
+    probed: Probe | None = None,
+    cache: CrushCache | None = None,
+    log: Callable[[str], None] = print,
+) -> CrushResult:
+    """Re-encode *fileInput* so it ends up within *tolerance* % below *size* MB.
+
+    *threads* caps the encoder threads (0 lets ffmpeg decide), and an already
+    *probed* file skips ffprobe. With a *cache*, the first attempt starts
+    from the bitrate ratio learned on earlier files of the same
+    codec/resolution bucket instead of sampling, and the final encode updates it.
+    """
+    startTime: float = time.time()
+    if not fileOutput:
+        fileOutput = fileInput[:fileInput.rindex('.')] + '.crushed' + fileInput[fileInput.rindex('.'):]
+    targetSizeKilobytes: int = size * 1024
+    targetSizeBytes: int = targetSizeKilobytes * 1024
+    if probed is None:
+        probed = cache.probe(fileInput) if cache else probe(fileInput)
+    durationSeconds: float = probed.duration
+    bitrate: int = round(targetSizeBytes * 8 / durationSeconds)
+    beforeSizeBytes: int = os.stat(fileInput).st_size
+
+    log(f"Crushing {fileInput} to {targetSizeKilobytes} KB with tolerance {tolerance}%")
+
+    # Aim for the middle of the accepted window [target / (1 + tolerance), target].
+    goalBytes: float = targetSizeBytes * (1 + 1 / (1 + tolerance / 100)) / 2
+
+    learned: float | None = cache.ratio(probed.bucket) if cache else None
+    model: tuple[float, float] | None = None
+    slope: float | None = None
+    if learned:
+        # Bytes per requested bit/s, as the encoder behaved on similar files.
+        slope = learned * durationSeconds / 8
+        bitrate = max(1, round(goalBytes / slope))
+        log(f"Warm start from {probed.bucket}: encoder delivers {learned:.2f}x the requested bitrate")
+    else:
+        with stage('sample'):
+            model = sample_size_model(fileInput, durationSeconds, bitrate, threads)
+    if model:
+        intercept, slope = model
+        log(f"Sampled {SAMPLE_COUNT} x {SAMPLE_SECONDS:g}s clips at 2 bitrates: "
+            f"size ~ {intercept / 1024 / 1024:.2f} MB + {slope:.1f} bytes per bit/s")
+        if intercept < goalBytes:
+            bitrate = max(1, round((goalBytes - intercept) / slope))
+
+    with tempfile.TemporaryDirectory(prefix='crush-') as workDir:
+        segments: list[str] = []
+        if chunks > 1:
+            segments = split_at_keyframes(fileInput, workDir, chunks, durationSeconds)
+            log(f"Split {fileInput} into {len(segments)} segments at keyframes")
+
+        def encode(bitrate: int) -> int:
+            with stage('ffmpeg'):
+                if len(segments) > 1:
+                    transcode_chunked(segments, fileOutput, bitrate, workDir, threads)
+                else:
+                    transcode(fileInput, fileOutput, bitrate, threads=threads)
+            return os.stat(fileOutput).st_size
+
+        history: list[tuple[int, int]] = []
+        factor: float = 0
+        attempt: int = 0
+        afterSizeBytes: int = 0
+        while (factor > 1.0 + (tolerance / 100)) or (factor < 1):
+            attempt = attempt + 1
+            if history:
+                bitrate = next_bitrate(history, goalBytes, slope)
+                if any(bitrate == b for b, _ in history):
+                    log(f"Attempt {attempt}: bitrate {bitrate} was already tried; the target size cannot be reached")
+                    attempt = attempt - 1
+                    break
+            log(f"Attempt {attempt}: Transcoding {fileInput} at bitrate {bitrate}")
+
+            afterSizeBytes = encode(bitrate)
+            history.append((bitrate, afterSizeBytes))
+            percentOfTarget: float = (100 / targetSizeBytes) * afterSizeBytes
+            factor = 100 / percentOfTarget
+            log(
+                f"Attempt {attempt}: Original size: {beforeSizeBytes / 1024 / 1024:.2f} MB, "
+                f"New size: {afterSizeBytes / 1024 / 1024:.2f} MB, "
+                f"Percentage of target: {percentOfTarget:.0f}% and bitrate {bitrate}"
+            )
+
+        if afterSizeBytes > targetSizeBytes:
+            # The search gave up on an encode that is still too big: fall back to the
+            # largest attempt that fitted, or fail so the file is not counted as crushed.
+            fitting: list[tuple[int, int]] = [h for h in history if h[1] <= targetSizeBytes]
+            if not fitting:
+                os.remove(fileOutput)
+                smallestBytes: int = min(afterBytes for _, afterBytes in history)
+                raise RuntimeError(
+                    f"could not get {fileInput} under {size} MB "
+                    f"(smallest attempt: {smallestBytes / 1024 / 1024:.2f} MB)"
+                )
+            bitrate = max(fitting, key=lambda h: h[1])[0]
+            attempt = attempt + 1
+            log(f"Attempt {attempt}: Re-encoding at bitrate {bitrate}, the largest attempt under the target")
+            afterSizeBytes = encode(bitrate)
+            factor = targetSizeBytes / afterSizeBytes
+
+    # Only the encode that was kept teaches the cache; the overshoots and
+    # undershoots before it would drag the bucket's ratio towards them.
+    if cache and 1 <= factor <= 1.0 + (tolerance / 100):
+        cache.record(probed.bucket, afterSizeBytes * 8 / durationSeconds / bitrate)
+
+    seconds: float = time.time() - startTime
+    log(f"Completed in {attempt} attempts over {round(seconds, 2)} seconds")
+    log(f" > Exported as {fileOutput}")
+    return CrushResult(fileInput, fileOutput, durationSeconds, beforeSizeBytes, afterSizeBytes, attempt, seconds)
+
+
+def expand_inputs(paths: list[str]) -> list[str]:
+    """Return the video files named by *paths*, expanding directories (non-recursively)."""
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and '.crushed.' not in name
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def crush_many(
+    files: list[str], size: int, tolerance: int, jobs: int = 0, chunks: int = 1, cache: CrushCache | None = None
+) -> list[CrushResult | None]:
+    """Crush *files* on a worker pool sized to the machine, longest video first.
+
+    All files are probed concurrently first. Encodes are then started in
+    order of decreasing duration, so the longest job never starts last and
+    holds up the end of the run. Each concurrent encode gets an equal share
+    of the cores as its thread budget. Failed files come back as ``None``.
+    """
+    cpus: int = os.cpu_count() or 1
+    jobs = jobs or max(1, cpus // MIN_THREADS_PER_JOB)
+    jobs = max(1, min(jobs, len(files)))
+    threads: int = max(1, cpus // jobs)
+    printLock = threading.Lock()
+
+    def logFor(name: str) -> Callable[[str], None]:
+        def log(message: str) -> None:
+            with printLock:
+                print(f"[{name}] {message}", flush=True)
+        return log
+
+    startTime: float = time.time()
+    with ThreadPoolExecutor(max_workers=cpus) as pool:
+        probes: list[Probe | None] = []
+        for fileInput, fut in [(f, pool.submit(cache.probe if cache else probe, f)) for f in files]:
+            try:
+                probes.append(fut.result())
+            except (subprocess.CalledProcessError, KeyError, ValueError, OSError) as exc:
+                logFor(os.path.basename(fileInput))(f"Could not probe duration: {exc}")
+                probes.append(None)
+
+    order: list[int] = sorted(
+        (i for i, p in enumerate(probes) if p is not None), key=lambda i: probes[i].duration, reverse=True
+    )
+    print(f"Crushing {len(order)} files with {jobs} concurrent encodes x {threads} threads")
+
+    results: list[CrushResult | None] = [None] * len(files)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(crush, files[i], None, size, tolerance, chunks, threads, probes[i], cache,
+                        logFor(os.path.basename(files[i]))): i
+            for i in order
+        }
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception as exc:  # noqa: BLE001 – keep the rest of the queue going
+                detail: str = exc.stderr.strip() if isinstance(exc, subprocess.CalledProcessError) and exc.stderr else ''
+                logFor(os.path.basename(files[i]))(f"Failed: {exc}" + (f"\n{detail}" if detail else ''))
+
+    elapsed: float = time.time() - startTime
+    done: list[CrushResult] = [r for r in results if r]
+    inputMegabytes: float = sum(r.beforeSizeBytes for r in done) / 1024 / 1024
+    videoSeconds: float = sum(r.durationSeconds for r in done)
     print(
-        f"Attempt {attempt}: Original size: {beforeSizeBytes / 1024 / 1024:.2f} MB, "
-        f"New size: {afterSizeBytes / 1024 / 1024:.2f} MB, "
-        f"Percentage of target: {percentOfTarget:.0f}% and bitrate {bitrate}"
+        f"Crushed {len(done)} of {len(files)} files in {elapsed:.2f} seconds: "
+        f"{inputMegabytes / elapsed:.2f} MB/s of input, "
+        f"{videoSeconds / elapsed:.2f} seconds of video per second"
     )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*', help='Files or directories to Crush')
+    parser.add_argument('-f', '--file', help='File to Crush', action='append', default=[])
+    parser.add_argument('-o', '--output', help='Output File (single file only)', required=False)
+    parser.add_argument("-s", "--size", help="Target Size in MB", type=int, default=8)
+    parser.add_argument("-t", "--tolerance", help="Tolerance", type=int, default=10)
+    parser.add_argument("-c", "--chunks", help="Split at keyframes and encode this many segments in parallel",
+                        type=int, default=1)
+    parser.add_argument("-j", "--jobs", help="Concurrent encodes in batch mode (default: by CPU count)",
+                        type=int, default=0)
+    parser.add_argument("--cache", help="Probe and bitrate-history cache file", default=DEFAULT_CACHE)
+    parser.add_argument("--no-cache", help="Probe every file and search from scratch", action='store_true')
+    instrument.setup(argv)
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    files: list[str] = expand_inputs(args.file + args.files)
+    if not files:
+        parser.error('no input files given')
+
+    if args.output and len(files) > 1:
+        parser.error('--output only works with a single input file')
+
+    cache: CrushCache | None = None if args.no_cache else CrushCache(args.cache)
+    try:
+        if len(files) == 1:
+            try:
+                crush(files[0], args.output, args.size, args.tolerance, args.chunks, cache=cache)
+            except RuntimeError as exc:
+                print(f"Failed: {exc}", file=sys.stderr)
+                return 1
+            return 0
+        results = crush_many(files, args.size, args.tolerance, args.jobs, args.chunks, cache)
+        return 0 if all(results) else 1
+    finally:
+        if cache:
+            cache.close()
+
 
-print(f"Completed in {attempt} attempts over {round(time.time() - startTime, 2)} seconds")
-print(f" > Exported as {fileOutput}")
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
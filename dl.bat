@@ -20,7 +20,5 @@ set end=%~2
 goto yt-dlp
 
 :yt-dlp
-yt-dlp -I %start%:%end% --lazy-playlist -P C:\Users\ACER\Music -o "%%(title)s.%%(ext)s" --no-write-playlist-metafiles ^
--f ba --write-subs --sub-format "best" --sub-langs "en.*,zh.*,ja" -x --audio-quality 0 --embed-thumbnail ^
---embed-metadata --no-add-chapters --convert-subs lrc --sponsorblock-remove intro,outro,music_offtopic ^
---no-overwrites https://www.youtube.com/playlist?list=PL_fjS67M7JRdaw9GD4CG7OjBCchTMdBAT
+rem Downloads one by one and post-processes (ffmpeg) in parallel; see dl.py for --folder, --jobs, --archive
+uv run --script "%~dp0dl.py" %start% %end%
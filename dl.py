@@ -0,0 +1,236 @@
+# /// script
+# requires-python = ">=3.9"
+# ///
+"""
+dl.py – Download songs from my YouTube Music playlist, post-processing in parallel
+
+The work ``dl.bat`` did in one yt-dlp call is split in two:
+
+1. **download** – the playlist range is listed, IDs already in the archive are
+   dropped, and each remaining song's best audio, subtitles, thumbnail and info
+   JSON are fetched one after another into a per-song staging folder;
+2. **post-process** – as soon as a song is fetched, a worker re-runs the
+   downloader on its info JSON (``--load-info-json``), which finds the files
+   already present and only runs the ffmpeg steps: SponsorBlock cuts, audio
+   extraction, LRC conversion and thumbnail/metadata embedding. The results
+   are moved into the music folder and the ID is added to the archive.
+
+So the ffmpeg work of earlier songs overlaps with fetching the next one.
+
+The archive uses yt-dlp's ``--download-archive`` format (``youtube <id>``). A
+song whose title already exists in the music folder is added to it without
+being fetched, so folders filled by the old ``dl.bat`` are picked up too.
+
+``--downloader`` replaces ``yt-dlp`` with any compatible command, e.g. the
+stand-in ``tests/fake_ytdlp.py``, so the pipeline runs offline.
+
+Usage
+-----
+python dl.py [start [end]] [--folder DIR] [--archive FILE] [--jobs N] [--downloader CMD] [--profile[=FILE]]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import instrument
+from instrument import stage
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PL_fjS67M7JRdaw9GD4CG7OjBCchTMdBAT"
+VIDEO_URL = "https://www.youtube.com/watch?v={}"
+DEFAULT_FOLDER = r"C:\Users\ACER\Music"
+ARCHIVE_NAME = ".dl-archive.txt"
+STAGING_NAME = ".dl-staging"
+TEMPLATE = "%(title)s.%(ext)s"
+
+SUB_LANGS = "en.*,zh.*,ja"
+SPONSORBLOCK_REMOVE = "intro,outro,music_offtopic"
+
+# Fetched in the download stage; the post-processing run reuses these files
+DOWNLOAD_OPTIONS = [
+    "-f", "ba", "--write-subs", "--sub-format", "best", "--sub-langs", SUB_LANGS,
+    "--write-thumbnail", "--write-info-json", "--no-write-playlist-metafiles",
+]
+# Everything dl.bat did with ffmpeg after the download
+POSTPROCESS_OPTIONS = [
+    "-f", "ba", "--write-subs", "--sub-format", "best", "--sub-langs", SUB_LANGS,
+    "-x", "--audio-quality", "0", "--embed-thumbnail", "--embed-metadata", "--no-add-chapters",
+    "--convert-subs", "lrc", "--sponsorblock-remove", SPONSORBLOCK_REMOVE,
+]
+
+# Characters yt-dlp swaps for look-alikes in Windows file names
+_FILENAME_SUBSTITUTES = str.maketrans({
+    "/": "⧸", "\\": "⧹", ":": "：", "*": "＊", "?": "？", '"': "＂", "<": "＜", ">": "＞", "|": "｜",
+})
+
+
+# ── Archive ───────────────────────────────────────────────────────────────────
+class Archive:
+    """The set of downloaded IDs, stored in yt-dlp's download-archive format."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.ids: set[str] = set()
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                extractor, _, video_id = line.strip().partition(" ")
+                if extractor == "youtube" and video_id:
+                    self.ids.add(video_id)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.ids
+
+    def add(self, video_id: str) -> None:
+        if video_id not in self.ids:
+            self.ids.add(video_id)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(f"youtube {video_id}\n")
+
+
+def already_in_folder(folder: Path, title: str) -> bool:
+    """Return ``True`` if *folder* holds a file named after *title* (as dl.bat would have saved it)."""
+    for name in {title, title.translate(_FILENAME_SUBSTITUTES)}:
+        if any(p.suffix != ".lrc" for p in folder.glob(f"{glob_escape(name)}.*")):
+            return True
+    return False
+
+
+def glob_escape(text: str) -> str:
+    return "".join(f"[{c}]" if c in "*?[" else c for c in text)
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+def list_range(downloader: list[str], start: str, end: str) -> list[tuple[str, str]]:
+    """Return ``(id, title)`` of the playlist items *start*..*end* without downloading them."""
+    with stage("list"):
+        out = subprocess.run(
+            [*downloader, "--flat-playlist", "--lazy-playlist", "-I", f"{start}:{end}",
+             "--print", "%(id)s\t%(title)s", PLAYLIST],
+            check=True, capture_output=True, text=True, encoding="utf-8",
+        ).stdout
+    return [tuple(line.split("\t", 1)) for line in out.splitlines() if "\t" in line]
+
+
+def download(downloader: list[str], video_id: str, staging: Path) -> Path:
+    """Fetch the raw media of one song into *staging*; return its info JSON.
+
+    *staging* starts out empty and is removed again if the download fails.
+    """
+    shutil.rmtree(staging, ignore_errors=True)  # left over from an interrupted run
+    staging.mkdir(parents=True)
+    try:
+        with stage("download"):
+            subprocess.run(
+                [*downloader, *DOWNLOAD_OPTIONS, "-P", str(staging), "-o", TEMPLATE, VIDEO_URL.format(video_id)],
+                check=True,
+            )
+        infos = list(staging.glob("*.info.json"))
+        if len(infos) != 1:
+            raise RuntimeError(f"expected one info JSON in {staging}, found {len(infos)}")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return infos[0]
+
+
+def postprocess(downloader: list[str], info: Path, folder: Path) -> list[Path]:
+    """Run the ffmpeg steps on a fetched song and move the results into *folder*.
+
+    The staging folder is removed either way; a failed song is fetched again next time.
+    """
+    staging = info.parent
+    try:
+        with stage("postprocess"):
+            subprocess.run(
+                [*downloader, "--load-info-json", str(info), *POSTPROCESS_OPTIONS,
+                 "--no-overwrites", "-P", str(staging), "-o", TEMPLATE],
+                check=True,
+            )
+        moved = []
+        for path in sorted(staging.iterdir()):
+            if path.name.endswith(".info.json"):
+                continue
+            target = folder / path.name
+            if target.exists():  # dl.bat ran with --no-overwrites
+                continue
+            shutil.move(str(path), target)
+            moved.append(target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return moved
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Download songs from the playlist into the music folder.")
+    parser.add_argument("start", nargs="?", help="Index of the first song (newest = 1)")
+    parser.add_argument("end", nargs="?", help="Index of the last song (default: start)")
+    parser.add_argument("--folder", type=Path, default=Path(DEFAULT_FOLDER), help=f"Music folder (default: {DEFAULT_FOLDER})")
+    parser.add_argument("--archive", type=Path, help=f"Download archive (default: FOLDER/{ARCHIVE_NAME})")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Songs post-processed at once (default: half the CPUs)")
+    parser.add_argument("--downloader", default="yt-dlp", help="yt-dlp command, or a stand-in for offline runs")
+    instrument.setup(argv)
+    args = parser.parse_args(argv)
+
+    start = args.start or input("start:")
+    end = args.end or (start if args.start else input("end:"))
+    downloader = shlex.split(args.downloader, posix=os.name != "nt")
+    folder: Path = args.folder
+    folder.mkdir(parents=True, exist_ok=True)
+    archive = Archive(args.archive or folder / ARCHIVE_NAME)
+
+    began = time.perf_counter()
+    songs = []
+    for video_id, title in list_range(downloader, start, end):
+        if video_id in archive:
+            print(f"SKIP {title} (in archive)")
+        elif already_in_folder(folder, title):
+            print(f"SKIP {title} (already in {folder})")
+            archive.add(video_id)
+        else:
+            songs.append((video_id, title))
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        pending: dict[Future, tuple[str, str]] = {}
+        for video_id, title in songs:
+            try:
+                info = download(downloader, video_id, folder / STAGING_NAME / video_id)
+            except (subprocess.CalledProcessError, OSError, RuntimeError) as exc:
+                failed += 1
+                print(f"FAIL {title}: download: {exc}", file=sys.stderr)
+                continue
+            print(f"GOT  {title}")
+            # ffmpeg runs on the pool while the next song downloads
+            pending[pool.submit(postprocess, downloader, info, folder)] = (video_id, title)
+
+        for future in as_completed(pending):
+            video_id, title = pending[future]
+            try:
+                moved = future.result()
+            except (subprocess.CalledProcessError, OSError) as exc:
+                failed += 1
+                print(f"FAIL {title}: post-processing: {exc}", file=sys.stderr)
+                continue
+            archive.add(video_id)
+            print(f"OK   {title} -> {', '.join(p.name for p in moved) or 'nothing new'}")
+
+    try:
+        (folder / STAGING_NAME).rmdir()
+    except OSError:  # never created, or another run is still using it
+        pass
+
+    print(f"{len(songs) - failed} of {len(songs)} songs in {time.perf_counter() - began:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
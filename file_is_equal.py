@@ -0,0 +1,237 @@
+# /// script
+# requires-python = ">=3.9"
+# ///
+"""
+file_is_equal.py – Group files (or whole directory trees) into sets of identical content
+
+Files are narrowed down in stages so most of them are never read in full:
+
+1. group by size – files of a unique size cannot have a duplicate;
+2. hash the first and last ``PARTIAL_BYTES`` of each remaining file;
+3. hash the whole file (memory-mapped) only when the partial hashes collide.
+
+Hashing runs on a thread pool (``hashlib`` releases the GIL on large buffers)
+and hashes are cached in SQLite (``--cache``), one row per path checked against
+size and mtime, so unchanged files are not read again on the next run.
+
+Exit codes match the old ``file-is-equal.bat``: 0 when all files are
+identical, 2 when they are not, 1 on usage errors or unreadable files.
+
+Usage
+-----
+python file_is_equal.py [--jobs N] [--cache FILE | --no-cache] [--profile[=FILE]] <file|dir> [<file|dir> ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+import instrument
+from instrument import stage
+
+# Bytes hashed at each end of a file in the partial stage; files up to twice
+# this size are read whole, so their partial hash is already the full hash
+PARTIAL_BYTES = 64 * 1024
+BUFFER_BYTES = 8 * 1024 * 1024
+
+DEFAULT_CACHE = Path.home() / ".file_is_equal.sqlite"
+
+# One row per path: a file that changed replaces its row, so the cache only grows
+# with the number of files
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial  TEXT,
+    full     TEXT
+);
+"""
+
+
+# ── Hashing ───────────────────────────────────────────────────────────────────
+def partial_hash(path: str, size: int) -> str:
+    """Hash the first and last ``PARTIAL_BYTES`` of *path* (all of it if small)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        if size <= 2 * PARTIAL_BYTES:
+            h.update(fh.read())
+        else:
+            h.update(fh.read(PARTIAL_BYTES))
+            fh.seek(-PARTIAL_BYTES, os.SEEK_END)
+            h.update(fh.read(PARTIAL_BYTES))
+    return h.hexdigest()
+
+
+def full_hash(path: str, size: int) -> str:
+    """Hash all of *path*, memory-mapped where possible, else in large reads."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        if size == 0:
+            return h.hexdigest()
+        try:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+        except (OSError, ValueError):  # e.g. special files or a 32-bit address space
+            for block in iter(lambda: fh.read(BUFFER_BYTES), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+class HashCache:
+    """SQLite cache of partial and full hashes per path, valid while size and mtime match."""
+
+    def __init__(self, path: str | Path | None = DEFAULT_CACHE) -> None:
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", timeout=60)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self) -> HashCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, key: tuple[str, int, int], column: str) -> str | None:
+        row = self._conn.execute(
+            f"SELECT {column} FROM files WHERE path = ? AND size = ? AND mtime_ns = ?", key
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: tuple[str, int, int], column: str, digest: str) -> None:
+        # The other digest survives only if it belongs to this same version of the file.
+        other = "full" if column == "partial" else "partial"
+        self._conn.execute(
+            f"""
+            INSERT OR REPLACE INTO files (path, size, mtime_ns, {column}, {other})
+            VALUES (?, ?, ?, ?, (SELECT {other} FROM files WHERE path = ? AND size = ? AND mtime_ns = ?))
+            """,
+            (*key, digest, *key),
+        )
+
+
+# ── Grouping ──────────────────────────────────────────────────────────────────
+def expand_inputs(paths: Iterable[str]) -> list[str]:
+    """Return the files named by *paths*, walking directories recursively."""
+    files: list[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, names in os.walk(p):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(p)
+    return files
+
+
+def _refine(
+    groups: list[list[tuple[str, int, int]]],
+    column: str,
+    hasher: Callable[[str, int], str],
+    cache: HashCache,
+    pool: ThreadPoolExecutor,
+    errors: dict[str, str],
+) -> list[list[tuple[str, int, int]]]:
+    """Split every group by *hasher*, keeping only sub-groups with more than one file."""
+    keys = [key for group in groups for key in group]
+    digests = {key: cache.get(key, column) for key in keys}
+    todo = [key for key in keys if digests[key] is None]
+    for key, future in [(key, pool.submit(hasher, key[0], key[1])) for key in todo]:
+        try:
+            digests[key] = future.result()
+            cache.put(key, column, digests[key])
+        except OSError as exc:
+            errors[key[0]] = str(exc)
+
+    refined = []
+    for group in groups:
+        buckets: dict[str, list[tuple[str, int, int]]] = defaultdict(list)
+        for key in group:
+            if digests.get(key):
+                buckets[digests[key]].append(key)
+        refined.extend(b for b in buckets.values() if len(b) > 1)
+    return refined
+
+
+def find_identical(files: list[str], cache: HashCache, jobs: int = 8) -> tuple[list[list[str]], dict[str, str]]:
+    """Group *files* into sets of identical content.
+
+    Returns ``(sets, errors)``: the sets with more than one member, and a
+    mapping of unreadable files to their error.
+    """
+    errors: dict[str, str] = {}
+    by_size: dict[int, list[tuple[str, int, int]]] = defaultdict(list)
+    with stage("stat"):
+        for path in dict.fromkeys(os.path.abspath(f) for f in files):
+            try:
+                st = os.stat(path)
+            except OSError as exc:
+                errors[path] = str(exc)
+                continue
+            by_size[st.st_size].append((path, st.st_size, st.st_mtime_ns))
+    groups = [group for group in by_size.values() if len(group) > 1]
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        with stage("partial hash"):
+            groups = _refine(groups, "partial", partial_hash, cache, pool, errors)
+        small = [g for g in groups if g[0][1] <= 2 * PARTIAL_BYTES]
+        large = [g for g in groups if g[0][1] > 2 * PARTIAL_BYTES]
+        with stage("full hash"):
+            groups = small + _refine(large, "full", full_hash, cache, pool, errors)
+
+    sets = sorted(sorted(path for path, _, _ in group) for group in groups)
+    return sets, errors
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Group files into sets of identical content.")
+    parser.add_argument("paths", nargs="+", help="Files and/or directories (searched recursively)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="Hashing threads")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE, help="Hash cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the hash cache")
+    instrument.setup(argv)
+    args = parser.parse_args(argv)
+
+    with stage("scan"):
+        files = expand_inputs(args.paths)
+    if not files:
+        print("No files found.", file=sys.stderr)
+        return 1
+
+    with HashCache(None if args.no_cache else args.cache) as cache:
+        sets, errors = find_identical(files, cache, max(1, args.jobs))
+
+    for path, error in errors.items():
+        print(f"ERROR {path}: {error}", file=sys.stderr)
+    if errors:
+        return 1
+
+    unique = set(map(os.path.abspath, files))
+    if len(unique) == 1 or (len(sets) == 1 and len(sets[0]) == len(unique)):
+        print(f"All {len(unique)} files are identical.")
+        return 0
+
+    for n, identical in enumerate(sets, 1):
+        print(f"Identical set {n}:")
+        for path in identical:
+            print(f"  {path}")
+    duplicates = sum(len(s) for s in sets)
+    print(f"NOT identical: {len(unique)} files, {len(sets)} identical sets covering {duplicates} files.")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+instrument.py – Stage timers, peak-RSS sampling and optional profiling for the scripts
+
+Every script marks its stages with :func:`stage` (or :func:`timed` for
+iterators that are consumed lazily)::
+
+    with stage("read"):
+        rows = load(...)
+    for row in timed("read", stream):
+        ...
+
+Nothing is recorded unless the run was started with ``--profile``, so the
+markers cost one flag check otherwise. :func:`setup` strips the flags from
+``sys.argv`` before the script parses its own arguments:
+
+``--profile[=FILE]``
+    write a JSON report (default ``<script>-profile.json``) when the script
+    exits: wall time, time and calls per stage, and peak RSS.
+``--profile-with=cprofile|pyinstrument``
+    also capture a function profile and add its hottest entries to the report
+    (implies ``--profile``).
+
+Stage times are *self* times: while a nested stage runs, the enclosing one is
+paused, so the stages add up to the instrumented part of the run. Process
+pools hand their workers' stages back with :func:`take_stages` and
+:func:`merge_stages`.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+PROFILERS = ("cprofile", "pyinstrument")
+# Functions listed from a cProfile capture, by cumulative time
+PROFILE_TOP = 30
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_stages: dict[str, dict[str, float]] = {}
+_started = time.perf_counter()
+_pid = os.getpid()  # process the recorded stages belong to
+
+
+# ── Memory ────────────────────────────────────────────────────────────────────
+def peak_rss_mb(children: bool = False) -> float | None:
+    """Return the peak resident set size of this process (or of its waited-for children) in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        procs = psutil.Process().children(recursive=True) if children else [psutil.Process()]
+        return max((p.memory_info().peak_wset for p in procs), default=0) / 1024 ** 2
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    return usage.ru_maxrss / 1024 ** 2 if sys.platform == "darwin" else usage.ru_maxrss / 1024
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    """Start recording stages (without a report); for pool workers of a profiled run."""
+    global _enabled
+    _enabled = True
+
+
+def start_worker(profiling: bool) -> None:
+    """In a pool worker: record stages if the parent run is profiled, dropping any a fork copied over.
+
+    Harmless when the "worker" runs in the profiled process itself.
+    """
+    global _pid
+    if profiling and (not _enabled or _pid != os.getpid()):
+        _pid = os.getpid()
+        enable()
+        take_stages()
+
+
+def _note_peak(name: str, peak: float | None) -> None:
+    if peak is not None:
+        with _lock:
+            entry = _stages[name]
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"] or 0.0, peak)
+
+
+def _record(name: str, seconds: float, calls: int = 1) -> None:
+    with _lock:
+        entry = _stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_rss_mb": None})
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+
+
+@contextmanager
+def stage(name: str, sample_rss: bool = True) -> Iterator[None]:
+    """Time the enclosed block as stage *name*, noting the peak RSS when it ends."""
+    if not _enabled:
+        yield
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    frame = [0.0]  # time spent in nested stages
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        _record(name, elapsed - frame[0])
+        _note_peak(name, peak_rss_mb() if sample_rss else None)
+
+
+def timed(name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Yield from *iterable*, timing each step as stage *name* (without RSS samples, to stay cheap)."""
+    if not _enabled:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with stage(name, sample_rss=False):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def take_stages() -> dict[str, dict[str, float]]:
+    """Return and clear the stages recorded so far (to send them back from a pool worker)."""
+    with _lock:
+        taken = {name: dict(entry) for name, entry in _stages.items()}
+        _stages.clear()
+    return taken
+
+
+def merge_stages(stages: dict[str, dict[str, float]] | None) -> None:
+    """Add stages recorded elsewhere (e.g. in a pool worker) to this run's."""
+    for name, entry in (stages or {}).items():
+        _record(name, entry["seconds"], int(entry["calls"]))
+        _note_peak(name, entry.get("peak_rss_mb"))
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+def report() -> dict:
+    """Return the profile of the run so far as a JSON-serialisable dict."""
+    with _lock:
+        stages = {name: dict(entry) for name, entry in _stages.items()}
+    return {
+        "script": Path(sys.argv[0]).name,
+        "argv": sys.argv[1:],
+        "pid": os.getpid(),
+        "wall": time.perf_counter() - _started,
+        "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1]["seconds"])),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(children=True),
+    }
+
+
+def _cprofile_top(profiler) -> list[dict]:
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "calls": calls, "tottime": tottime, "cumtime": cumtime,
+        })
+    return sorted(rows, key=lambda r: -r["cumtime"])[:PROFILE_TOP]
+
+
+def setup(argv: list[str] | None = None) -> None:
+    """Handle and remove ``--profile[=FILE]`` / ``--profile-with=NAME``.
+
+    *argv* is the argument list a script's ``main`` was given, edited in place;
+    ``None`` means the command line (``sys.argv[1:]``).
+    """
+    global _started
+    if argv is None:
+        argv = sys.argv
+        args = sys.argv[1:]
+    else:
+        args = list(argv)
+    path = profiler_name = None
+    for arg in args:
+        if arg == "--profile" or arg.startswith("--profile="):
+            path = arg.partition("=")[2]
+            argv.remove(arg)
+        elif arg.startswith("--profile-with="):
+            profiler_name = arg.partition("=")[2]
+            argv.remove(arg)
+    if path is None and profiler_name is None:
+        return
+    path = path or f"{Path(sys.argv[0]).stem}-profile.json"
+    if profiler_name not in (None, *PROFILERS):
+        sys.exit(f"--profile-with must be one of {', '.join(PROFILERS)}")
+
+    enable()
+    _started = time.perf_counter()
+    capture = None
+    if profiler_name == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; using cProfile", file=sys.stderr)
+            profiler_name = "cprofile"
+        else:
+            capture = Profiler()
+            capture.start()
+    if profiler_name == "cprofile":
+        import cProfile
+
+        capture = cProfile.Profile()
+        capture.enable()
+
+    def write() -> None:
+        data = report()
+        if profiler_name == "cprofile":
+            capture.disable()
+            data["profile"] = _cprofile_top(capture)
+        elif capture is not None:
+            capture.stop()
+            data["profile"] = capture.output_text(unicode=True, color=False)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=2)
+        print(f"Profile written to {path}", file=sys.stderr)
+
+    atexit.register(write)
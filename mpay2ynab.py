@@ -13,16 +13,39 @@ The xlsx file can be downloaded in https://pay.macaupass.com/payment/#/tradeMana
 
 Usage
 -----
-python mpay2ynab.py statement.xlsx output.csv
+python mpay2ynab.py statement.xlsx output.csv [--ledger[=FILE]] [--profile[=FILE]]
+
+``--ledger`` also appends the transactions to the ledger (see ``ynab_ledger.py``).
 """
 
 from __future__ import annotations
 
 import sys
 from pathlib import Path
-from datetime import datetime
-
-import pandas as pd
+from typing import Iterable
+
+import instrument
+from instrument import stage, timed
+from ynab_common import (
+    ExportIndex,
+    Ledger,
+    Row,
+    YNAB_COLUMNS,
+    find_header,
+    getter,
+    iter_records,
+    iter_rows,
+    normalise_amount,
+    normalise_amounts,
+    normalise_date,
+    normalise_dates,
+    pick_engine,
+    pop_ledger_option,
+    read_frame,
+    record_keys,
+    transaction_keys,
+    write_csv,
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Constants
@@ -33,82 +56,157 @@ OUTFLOW_TYPES = {"交易", "轉出", "利是轉出"}
 ALL_TYPES     = INFLOW_TYPES | OUTFLOW_TYPES
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Helpers
+# Core logic
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _normalise_date(value) -> str:
-    """Return *value* formatted as ``MM/DD/YYYY`` or the original string.
+def _convert_records(columns: list[str], records: Iterable[Row]) -> tuple[list[list[str | None]], list[str]]:
+    """Pure-Python conversion for small statements; same output as the pandas path.
 
-    Accepts ``pandas.NA``, :class:`datetime.datetime` or arbitrary strings.
-    Anything that cannot be parsed as a date is returned unchanged.
+    Returns the YNAB rows together with their transaction keys.
     """
-    if pd.isna(value):
-        return ""
-
-    if isinstance(value, datetime):
-        return value.strftime("%m/%d/%Y")
-
-    try:
-        return pd.to_datetime(value).strftime("%m/%d/%Y")
-    except (ValueError, TypeError):
-        return str(value)
-
-# ──────────────────────────────────────────────────────────────────────────────
-# Core logic
-# ──────────────────────────────────────────────────────────────────────────────
-
-def convert(infile: str | Path, outfile: str | Path) -> None:
-    """Read *infile* (xlsx) and write *outfile* (csv) in YNAB format."""
-    df = (
-        pd.read_excel(infile, header=0, dtype=str)
-        .rename(
-            columns={
-                "交易時間": "Date",
-                "項目名稱": "Payee",
-                "交易編號": "Memo",
-                "分類"  : "Category",
-                "對方賬號": "Account",
-                "金額"  : "Amount",
-            }
-        )
-    )
+    date = getter(columns, "交易時間")
+    payee = getter(columns, "項目名稱")
+    memo = getter(columns, "交易編號")
+    category = getter(columns, "分類")
+    account = getter(columns, "對方賬號")
+    amount = getter(columns, "金額")
+    channel = getter(columns, "餘額/快捷支付")
 
-    # ── Filter & validate ────────────────────────────────────────────────────
-    df = df[df["餘額/快捷支付"].fillna("") != "快捷支付"]
+    records = [r for r in records if channel(r) != "快捷支付"]
 
-    unknown = set(df["Category"].dropna().unique()) - ALL_TYPES
+    unknown = {category(r) for r in records} - ALL_TYPES - {None}
     if unknown:
         raise ValueError(f"Unexpected 分類 values: {', '.join(sorted(unknown))}")
 
-    # ── Transform columns ───────────────────────────────────────────────────
-    df["Date"]   = df["Date"].apply(_normalise_date)
-    df["Amount"] = df["Amount"].str.replace(",", "", regex=False).fillna("")
-
-    df["Inflow"]  = df.apply(lambda r: r["Amount"] if r["Category"] in INFLOW_TYPES  else "", axis=1)
-    df["Outflow"] = df.apply(lambda r: r["Amount"] if r["Category"] in OUTFLOW_TYPES else "", axis=1)
-
-    df["Memo"] = df.apply(
-        lambda r: f"({r['Account']}) {r['Memo']}" if pd.notna(r["Account"]) and str(r["Account"]).strip() else r["Memo"],
-        axis=1,
-    )
+    out: list[list[str | None]] = []
+    for r in records:
+        amt = normalise_amount(amount(r))
+        cat = category(r)
+        out.append([
+            normalise_date(date(r)),
+            payee(r),
+            memo(r),
+            amt if cat in OUTFLOW_TYPES else "",
+            amt if cat in INFLOW_TYPES else "",
+        ])
+
+    # 交易編號 is unique per transaction; rows without one fall back to a fingerprint.
+    keys = [m if m is not None else k for m, k in zip(map(memo, records), record_keys(out))]
+
+    for row, r in zip(out, records):
+        acc = account(r)
+        if acc is not None and acc.strip():
+            row[2] = f"({acc}) {'nan' if row[2] is None else row[2]}"
+
+    return out, keys
+
+
+def convert(
+    infile: str | Path,
+    outfile: str | Path,
+    index: ExportIndex | None = None,
+    rows: Iterable[Row] | None = None,
+    engine: str = "auto",
+    ledger: Ledger | None = None,
+) -> int:
+    """Read *infile* (xlsx) and write *outfile* (csv) in YNAB format.
+
+    With an *index*, transactions whose 交易編號 was already exported from an
+    earlier statement are left out. With a *ledger*, every converted row is
+    also appended to it (the ledger skips rows it already has). *rows* may carry the rows of *infile*
+    already obtained from :func:`ynab_common.sniff`. *engine* is ``"auto"``
+    (pandas only for large statements), ``"python"`` or ``"pandas"``.
+    Returns the number of rows written.
+    """
+    rows = timed("read", iter_rows(infile) if rows is None else rows)
+    columns = find_header("mpay", rows)
+    engine, records = pick_engine(iter_records(rows, len(columns)), engine)
+
+    if engine == "python":
+        with stage("normalise"):
+            out, keys = _convert_records(columns, records)
+        if ledger is not None:
+            with stage("ledger"):
+                ledger.append("mpay", out, keys)
+        if index is not None:
+            with stage("index"):
+                out = [r for r, new in zip(out, index.claim("mpay", keys)) if new]
+        with stage("write"):
+            write_csv(outfile, out)
+        return len(out)
+
+    with stage("read"):
+        df = (
+            read_frame(columns, records)
+            .rename(
+                columns={
+                    "交易時間": "Date",
+                    "項目名稱": "Payee",
+                    "交易編號": "Memo",
+                    "分類"  : "Category",
+                    "對方賬號": "Account",
+                    "金額"  : "Amount",
+                }
+            )
+        )
+    with stage("normalise"):
+        # ── Filter & validate ────────────────────────────────────────────────
+        df = df[df["餘額/快捷支付"].fillna("") != "快捷支付"]
+
+        unknown = set(df["Category"].dropna().unique()) - ALL_TYPES
+        if unknown:
+            raise ValueError(f"Unexpected 分類 values: {', '.join(sorted(unknown))}")
+
+        # ── Transform columns ───────────────────────────────────────────────
+        df["Date"]   = normalise_dates(df["Date"])
+        df["Amount"] = normalise_amounts(df["Amount"])
+
+        amount   = df["Amount"]
+        category = df["Category"]
+        df["Inflow"]  = amount.where(category.isin(INFLOW_TYPES), "")
+        df["Outflow"] = amount.where(category.isin(OUTFLOW_TYPES), "")
+
+        # 交易編號 is unique per transaction; rows without one fall back to a fingerprint.
+        keys = df["Memo"].where(df["Memo"].notna(), transaction_keys(df))
+
+        account = df["Account"]
+        has_account = account.notna() & (account.astype(str).str.strip() != "")
+        df["Memo"] = df["Memo"].where(
+            ~has_account,
+            "(" + account.astype(str) + ") " + df["Memo"].astype(str),
+        )
 
     # ── Export ──────────────────────────────────────────────────────────────
-    df[["Date", "Payee", "Memo", "Outflow", "Inflow"]].to_csv(outfile, index=False)
+    if ledger is not None:
+        with stage("ledger"):
+            ledger.append("mpay", df[YNAB_COLUMNS].itertuples(index=False, name=None), keys.tolist())
+    if index is not None:
+        with stage("index"):
+            df = df.loc[index.claim("mpay", keys.tolist())]
+    with stage("write"):
+        df[YNAB_COLUMNS].to_csv(outfile, index=False)
+    return len(df)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # CLI wrapper
 # ──────────────────────────────────────────────────────────────────────────────
 
 def _usage() -> None:
-    print("Usage: mpay2ynab.py <input.xlsx> <output.csv>", file=sys.stderr)
+    print("Usage: mpay2ynab.py <input.xlsx> <output.csv> [--ledger[=FILE]]", file=sys.stderr)
     sys.exit(1)
 
 
 def main() -> None:
+    instrument.setup()
+    ledger = pop_ledger_option(sys.argv)
     if len(sys.argv) != 3:
         _usage()
 
-    convert(sys.argv[1], sys.argv[2])
+    try:
+        convert(sys.argv[1], sys.argv[2], ledger=ledger)
+    finally:
+        if ledger is not None:
+            ledger.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,22 @@
 #!/usr/bin/env python3
 """Renames keys in the YAML front matter of a Markdown file.
 
-If a directory is given, the script walks it (``glob('*.md')``) and processes every ``.md`` file it finds.
+If a directory is given, every ``.md`` file in it is processed on a pool of worker processes; with
+``--recursive`` its sub-directories are walked too. ``--include``/``--exclude`` globs (matched against the
+path relative to the directory) pick the files. A failing file is reported and the rest carry on; the run ends
+with a summary of the files scanned, changed, skipped and failed.
+
+Only the lines of the renamed keys are rewritten; the rest of the front matter keeps its quoting, comments and
+order; keys whose value changes are re-dumped on their own.
+
+``--spec`` names a YAML/JSON list of further transforms (``rename``, ``delete``, ``set_default``, ``dedupe``,
+``rewrite``; see :func:`compile_transforms`), applied with the renames in a single pass per file.
+
+For directories a key index (``--index``, refreshed by size and mtime) sends the transforms only to notes that
+contain an affected key; ``--key-counts`` lists the keys in use instead.
+
+``--profile[=FILE]`` writes a JSON report of the time spent scanning, indexing, reading, parsing, transforming
+and writing (see ``instrument.py``).
 
 This version supports **shallow merging** when both the original key and the
 new key already exist in the front‑matter:
@@ -26,16 +41,34 @@ new key already exist in the front‑matter:
 import os
 import sys
 import argparse
+import fnmatch
 import json
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
 
 import yaml
 import typer
 
+import instrument
+from instrument import stage
+
 
 app = typer.Typer()
 
+# libyaml's C loader/dumper are much faster than the pure‑Python ones; fall back when PyYAML was built without it
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# A line that starts a top-level ``key: value`` entry: a quoted or plain key at column 0 followed by ':'
+_KEY_LINE = re.compile(r"""^(?P<key>"(?:[^"\\\n]|\\.)*"|'(?:[^'\n]|'')*'|[^\s#'"\-?:{}\[\],&*!|>%@`][^\n]*?)[ \t]*:(?=[ \t]|\r?\n|$)""")
+_PLAIN_KEY = re.compile(r"[^\W\d][\w .\-/]*(?<! )")
+
 
 # ───────────────────────────────────────────────────────────────────────────────
 # Helper functions
@@ -54,6 +87,39 @@ def _is_deep_structure(value: Any) -> bool:
     return False
 
 
+class _ItemSet:
+    """Membership test over list items: hashed, with a linear scan for unhashable items only."""
+
+    def __init__(self, items: list[Any] = ()) -> None:
+        self._hashed: set[Any] = set()
+        self._other: list[Any] = []
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Any) -> None:
+        try:
+            self._hashed.add(item)
+        except TypeError:
+            self._other.append(item)
+
+    def __contains__(self, item: Any) -> bool:
+        try:
+            return item in self._hashed
+        except TypeError:
+            return item in self._other
+
+
+def _dedupe(items: list[Any]) -> list[Any]:
+    """Return *items* without repeats, keeping the first occurrence of each."""
+    seen = _ItemSet()
+    unique = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique
+
+
 def _merge_shallow(val_old: Any, val_new: Any) -> Any:
     """Merge *val_old* (from the original key) into *val_new* (target key).
 
@@ -84,17 +150,331 @@ def _merge_shallow(val_old: Any, val_new: Any) -> Any:
     if isinstance(val_old, list):
         if _is_deep_structure(val_old) or _is_deep_structure(val_new):
             raise ValueError("deep structures found in list merge")
-        merged_list = val_new + [item for item in val_old if item not in val_new]
+        seen = _ItemSet(val_new)
+        merged_list = val_new + [item for item in val_old if item not in seen]
         return merged_list
 
     # Scalars (str, int, float, bool, etc.)
     return val_old  # original key overwrites
 
 
+def _load(text: str) -> Any:
+    return yaml.load(text, Loader=_Loader)
+
+
+def _dump(front_matter: dict[str, Any]) -> str:
+    # default_flow_style=False ensures that lists and dicts are not dumped in a single line
+    # Mostly important for the top-level tag mapping, we need to avoid pyyaml dumping it as a single line like
+    #   {Aliases: [], Date Created: 'Friday, May 2nd 2025, 11:16:47 am'}
+    return yaml.dump(front_matter, Dumper=_Dumper, default_flow_style=False, sort_keys=False)
+
+
+def _format_key(key: str) -> str:
+    """Return *key* as YAML key text: plain when it reads back as the same string, else double‑quoted."""
+    if _PLAIN_KEY.fullmatch(key) and _load(key) == key:
+        return key
+    return json.dumps(key, ensure_ascii=False)
+
+
+def _top_level_entries(front_yaml: str) -> list[list] | None:
+    """Split *front_yaml* into ``[key, lines, key_end]`` entries, one per top-level key.
+
+    Continuation lines (indented, block‑sequence items, comments, blank lines)
+    belong to the entry above them; lines before the first key form an entry
+    with key ``None``. *key_end* is where the key text ends on the first line.
+    Returns ``None`` when a key repeats, since the loader would keep only the
+    last value.
+    """
+    entries: list[list] = [[None, [], 0]]
+    seen = set()
+    for line in front_yaml.splitlines(keepends=True):
+        match = _KEY_LINE.match(line)
+        if not match:
+            entries[-1][1].append(line)
+            continue
+        key = match["key"]
+        if key[0] in "'\"":
+            key = _load(key)
+        if key in seen:
+            return None
+        seen.add(key)
+        entries.append([key, [line], match.end("key")])
+    return entries
+
+
+def _read_front_matter(file: TextIO) -> tuple[str, str] | None:
+    """Read the front matter from the start of *file*, stopping at its closing ``---``.
+
+    Returns ``(yaml_text, tail)`` where *tail* is whatever followed the closing
+    ``---`` on its line; the rest of the note is left unread in *file*. Returns
+    ``None`` when the file has no (terminated) front matter. Like splitting the
+    whole text on ``---``, the first ``---`` after the opening one closes it.
+    """
+    first = file.readline()
+    if not first.startswith('---'):
+        return None
+    chunks = []
+    line = first[3:]
+    while True:
+        end = line.find('---')
+        if end != -1:
+            chunks.append(line[:end])
+            return "".join(chunks), line[end + 3:]
+        chunks.append(line)
+        line = file.readline()
+        if not line:
+            return None
+
+
+def _write_atomic(file_path: Path, content: str) -> None:
+    """Replace *file_path* with *content* via a temporary file in the same directory.
+
+    The note keeps its permission bits; mkstemp would otherwise leave it 0600.
+    """
+    fd, tmp = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        shutil.copymode(file_path, tmp)
+        os.replace(tmp, file_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
 # ───────────────────────────────────────────────────────────────────────────────
 # Core logic
 # ───────────────────────────────────────────────────────────────────────────────
-def rename_frontmatter_keys(file_path: str | Path, **key_mapping: str) -> bool:
+class _FrontMatter:
+    """Parsed front matter kept in step with its text.
+
+    Every edit is applied to :attr:`data` exactly as a parse/modify/dump cycle
+    would, and to the top-level entries of the original text, so only the
+    lines of touched keys change and quoting, comments and ordering elsewhere
+    survive. Renames keep the key's value lines; new or changed values are
+    dumped for that one key. When the text cannot follow (a key that is not
+    found in it, a repeated key) or does not load back to :attr:`data`,
+    :meth:`text` dumps the whole block instead.
+    """
+
+    def __init__(self, front_yaml: str, data: dict[str, Any], file_path: str | Path) -> None:
+        self.data = data
+        self.file_path = file_path
+        self.changed = False
+        self._entries = _top_level_entries(front_yaml)
+        self._textual = self._entries is not None
+        self._index = {entry[0]: entry for entry in self._entries[1:]} if self._textual else {}
+
+    def _take(self, key: str) -> list | None:
+        entry = self._index.pop(key, None)
+        self._textual = self._textual and entry is not None
+        return entry
+
+    def _place(self, key: str, entry: list, instead_of: list | None = None) -> None:
+        """Put *entry* for *key* where *instead_of* was, or at the end of the block."""
+        if not self._textual:
+            return
+        if instead_of is None:
+            self._entries.append(entry)
+        else:
+            self._entries[self._entries.index(instead_of)] = entry
+        self._index[key] = entry
+
+    def _put(self, key: str, value: Any) -> None:
+        """Set *key* to *value*, re-dumping only that key's lines."""
+        if key in self.data and key not in self._index:
+            self._textual = False  # The key is in the text somewhere we could not find
+        self.data[key] = value
+        self.changed = True
+        text = _dump({key: value})
+        self._place(key, [key, text.splitlines(keepends=True), 0], self._index.get(key))
+
+    @staticmethod
+    def _renamed(entry: list, key: str) -> list:
+        text = _format_key(key)
+        return [key, [text + entry[1][0][entry[2]:], *entry[1][1:]], len(text)]
+
+    def rename(self, old_key: str, new_key: str) -> None:
+        if old_key not in self.data or old_key == new_key:
+            return  # Nothing to rename
+        self.changed = True
+        old_val = self.data.pop(old_key)
+        old_entry = self._take(old_key)
+        if new_key not in self.data:
+            self.data[new_key] = old_val
+            if self._textual:
+                self._place(new_key, self._renamed(old_entry, new_key), old_entry)
+            return
+
+        new_val = self.data[new_key]
+        try:
+            merged = _merge_shallow(old_val, new_val)
+        except ValueError as exc:
+            raise ValueError(f"Error merging '{old_key}' into '{new_key}' in {self.file_path}") from exc
+        if self._textual:
+            self._entries.remove(old_entry)
+        if merged is old_val:
+            # The original key's value wins; its lines take the target key's place
+            self.data[new_key] = merged
+            target = self._take(new_key)
+            if self._textual:
+                self._place(new_key, self._renamed(old_entry, new_key), target)
+        elif merged is not new_val:
+            self._put(new_key, merged)
+
+    def delete(self, key: str) -> None:
+        if key in self.data:
+            del self.data[key]
+            self.changed = True
+            entry = self._take(key)
+            if self._textual:
+                self._entries.remove(entry)
+
+    def set_default(self, key: str, value: Any) -> None:
+        if key not in self.data:
+            self._put(key, value)
+
+    def update(self, key: str, value: Any) -> None:
+        """Replace the value of an existing *key* if *value* differs from it."""
+        if key in self.data and value != self.data[key]:
+            self._put(key, value)
+
+    def text(self) -> str:
+        """Return the new text between the ``---`` lines."""
+        if self._textual:
+            edited = "".join(line for entry in self._entries for line in entry[1])
+            try:
+                if (_load(edited) or {}) == self.data:
+                    return edited
+            except yaml.YAMLError:
+                pass  # e.g. an alias whose anchor line was renamed or deleted away
+
+        return "\n" + _dump(self.data)
+
+
+# One step of a compiled transform: the operation and its normalised arguments
+Step = tuple[str, Any]
+
+
+def compile_transforms(spec: list[dict[str, Any]]) -> list[Step]:
+    """Check a declarative transform *spec* and compile it into steps for :func:`transform_frontmatter`.
+
+    The spec is a list of one‑key mappings, applied in order to every file::
+
+        - rename: {old: new}           # merged with _merge_shallow if *new* exists
+        - delete: [key, ...]
+        - set_default: {key: value}    # only where the key is missing
+        - dedupe: [key, ...]           # drop repeated list items, keeping the first
+        - rewrite: {key: {old_value: new_value}}   # the value, or each item of a list
+
+    Raises:
+        ValueError: If an operation is unknown or its arguments have the wrong shape.
+    """
+    steps: list[Step] = []
+    for number, operation in enumerate(spec, 1):
+        if not isinstance(operation, dict) or len(operation) != 1:
+            raise ValueError(f"Transform {number}: expected a mapping with a single operation, got {operation!r}")
+        (kind, args), = operation.items()
+        if kind in ("rename", "set_default") and isinstance(args, dict):
+            steps.append((kind, tuple(args.items())))
+        elif kind in ("delete", "dedupe") and isinstance(args, list):
+            steps.append((kind, tuple(args)))
+        elif kind == "rewrite" and isinstance(args, dict) and all(isinstance(t, dict) for t in args.values()):
+            steps.append((kind, tuple(args.items())))
+        else:
+            raise ValueError(f"Transform {number}: unknown operation or bad arguments: {operation!r}")
+    return steps
+
+
+def _rewrite(value: Any, table: dict[Any, Any]) -> Any:
+    """Map *value* (or each item of a list *value*) through *table*."""
+    def one(item: Any) -> Any:
+        try:
+            return table.get(item, item)
+        except TypeError:  # unhashable
+            return item
+
+    return [one(item) for item in value] if isinstance(value, list) else one(value)
+
+
+def _apply(front: _FrontMatter, steps: list[Step]) -> None:
+    for kind, args in steps:
+        if kind == "rename":
+            for old_key, new_key in args:
+                front.rename(old_key, new_key)
+        elif kind == "delete":
+            for key in args:
+                front.delete(key)
+        elif kind == "set_default":
+            for key, value in args:
+                front.set_default(key, value)
+        elif kind == "dedupe":
+            for key in args:
+                if isinstance(front.data.get(key), list):
+                    front.update(key, _dedupe(front.data[key]))
+        elif kind == "rewrite":
+            for key, table in args:
+                if key in front.data:
+                    front.update(key, _rewrite(front.data[key], table))
+
+
+def transform_frontmatter(file_path: str | Path, steps: list[Step]) -> bool | None:
+    """
+    Apply compiled transform *steps* to the YAML front matter of a Markdown file in one read/parse/write.
+
+    Args:
+        file_path: Path to the Markdown file
+        steps: Steps from :func:`compile_transforms`
+
+    Only the front matter is read unless a step changes it; the file is then
+    rewritten atomically. Notes no step applies to are left untouched.
+
+    Returns:
+        bool | None: True if the file was modified, False if no step changed it,
+        None if it has no front matter
+    """
+    if not os.path.exists(file_path):
+        raise ValueError(f"File {file_path} does not exist.")
+
+    file_path = Path(file_path)
+    with open(file_path, 'r', encoding='utf-8') as file:  # Error reading file will be caught by the caller
+        # Read up to the closing '---' (the end of the front‑matter), not the whole note
+        with stage("read"):
+            parts = _read_front_matter(file)
+        if parts is None:
+            print(f"No front matter found in the file {file_path}.")
+            return None
+        front_yaml, tail = parts
+
+        with stage("parse"):
+            try:
+                front_matter: dict[str, Any] = _load(front_yaml) or {}
+            except yaml.YAMLError as exc:
+                raise ValueError(f"Error parsing YAML front matter in {file_path}") from exc
+
+        with stage("transform"):
+            front = _FrontMatter(front_yaml, front_matter, file_path)
+            _apply(front, steps)
+        if not front.changed:
+            return False  # Nothing to do; leave the file (and its mtime) alone
+
+        with stage("read"):
+            body = tail + file.read()
+
+    with stage("transform"):
+        new_content = f"---{front.text()}---{body}"
+
+    try:
+        with stage("write"):
+            _write_atomic(file_path, new_content)
+    except OSError as exc:
+        raise OSError(f"Error writing file") from exc
+
+    print(f"Successfully processed {file_path}")
+    return True
+
+
+def rename_frontmatter_keys(file_path: str | Path, **key_mapping: str) -> bool | None:
     """
     Rename (and possibly merge) keys in the YAML front matter of a Markdown file.
 
@@ -103,70 +483,233 @@ def rename_frontmatter_keys(file_path: str | Path, **key_mapping: str) -> bool:
         key_mapping: A mapping of original keys to their new names as keyword arguments
 
     Returns:
-        bool: True if file was successfully modified, False otherwise
+        bool | None: as :func:`transform_frontmatter`
     """
     if not key_mapping:
         raise ValueError("Error: No key mappings provided.")
 
-    if not os.path.exists(file_path):
-        raise ValueError(f"File {file_path} does not exist.")
+    return transform_frontmatter(file_path, compile_transforms([{"rename": key_mapping}]))
 
-    with open(file_path, 'r', encoding='utf-8') as file:  # Error reading file will be caught by the caller
-        content = file.read()
 
-    if not content.startswith('---'):
-        print(f"No front matter found in the file {file_path}.")
-        return False
+# ───────────────────────────────────────────────────────────────────────────────
+# Key index
+# ───────────────────────────────────────────────────────────────────────────────
+DEFAULT_INDEX = Path.home() / ".rename_md_frontmatter.sqlite"
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    broken   INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS keys (
+    path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    key  TEXT NOT NULL,
+    PRIMARY KEY (key, path)
+);
+CREATE INDEX IF NOT EXISTS keys_path ON keys (path);
+"""
 
-    # Split on the first two occurrences of '---' (Should be start & end of front‑matter)
-    parts = content.split("---", 2)
-    if len(parts) < 3:
-        print(f"No front matter found in the file {file_path}.")
-        return False
 
+def _scan_keys(file_path: str) -> tuple[str, int, int, list[str], bool]:
+    """Worker: return ``(path, size, mtime_ns, top-level keys, broken)`` for one note."""
+    st = os.stat(file_path)
     try:
-        front_matter: dict[str, Any] = yaml.safe_load(parts[1]) or {}
-    except yaml.YAMLError as exc:
-        raise ValueError(f"Error parsing YAML front matter in {file_path}") from exc
-
-    for old_key, new_key in key_mapping.items():
-        if old_key not in front_matter:
-            continue  # Nothing to rename
+        with open(file_path, 'r', encoding='utf-8') as file:
+            parts = _read_front_matter(file)
+        front_matter = (_load(parts[0]) if parts else None) or {}
+        if not isinstance(front_matter, dict):
+            raise ValueError("front matter is not a mapping")
+    except (OSError, UnicodeDecodeError, ValueError, yaml.YAMLError):
+        return file_path, st.st_size, st.st_mtime_ns, [], True
+    return file_path, st.st_size, st.st_mtime_ns, [str(key) for key in front_matter], False
+
+
+class KeyIndex:
+    """SQLite map of front-matter key → notes containing it, kept fresh by size and mtime.
+
+    :meth:`refresh` re-reads only notes whose size or mtime changed since they
+    were last indexed; notes whose front matter did not parse are marked broken
+    and always offered as candidates, so their errors still get reported.
+    """
 
-        old_val = front_matter.pop(old_key)
-        if new_key in front_matter:
-            try:
-                front_matter[new_key] = _merge_shallow(old_val, front_matter[new_key])
-            except ValueError as exc:
-                raise ValueError(f"Error merging '{old_key}' into '{new_key}' in {file_path}") from exc
+    def __init__(self, path: str | Path = DEFAULT_INDEX) -> None:
+        self._conn = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(_INDEX_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "KeyIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _scope(self, files: list[Path]) -> None:
+        """Load the absolute paths of *files* into the temporary table ``scope``."""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS scope (path TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM scope")
+        self._conn.executemany("INSERT OR IGNORE INTO scope VALUES (?)", ((str(f.absolute()),) for f in files))
+
+    def refresh(self, files: list[Path], jobs: int = 0) -> int:
+        """Bring the entries for *files* up to date and return how many notes were re-read."""
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self._conn.execute("SELECT path, size, mtime_ns FROM files")}
+        stale = []
+        for file_path in files:
+            path = str(file_path.absolute())
+            st = os.stat(path)
+            if known.get(path) != (st.st_size, st.st_mtime_ns):
+                stale.append(path)
+        if not stale:
+            return 0
+
+        jobs = min(jobs or os.cpu_count() or 1, len(stale))
+        if jobs <= 1:
+            scanned = [_scan_keys(path) for path in stale]
         else:
-            front_matter[new_key] = old_val
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                scanned = list(pool.map(_scan_keys, stale, chunksize=max(1, min(64, len(stale) // (jobs * 4)))))
+
+        cur = self._conn.cursor()
+        cur.execute("BEGIN")
+        for path, size, mtime_ns, keys, broken in scanned:
+            cur.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, size, mtime_ns, broken))
+            cur.execute("DELETE FROM keys WHERE path = ?", (path,))
+            cur.executemany("INSERT OR IGNORE INTO keys VALUES (?, ?)", ((path, key) for key in keys))
+        cur.execute("COMMIT")
+        return len(stale)
+
+    def prune(self, root: Path, files: list[Path]) -> None:
+        """Forget notes under *root* that are no longer among *files*."""
+        self._scope(files)
+        prefix = str(root.absolute()).rstrip(os.sep) + os.sep
+        self._conn.execute(
+            "DELETE FROM files WHERE substr(path, 1, ?) = ? AND path NOT IN (SELECT path FROM scope)",
+            (len(prefix), prefix),
+        )
+
+    def candidates(self, files: list[Path], keys: set[str]) -> list[Path]:
+        """Return those of *files* that contain any of *keys* (or could not be indexed)."""
+        self._scope(files)
+        marks = ", ".join("?" * len(keys)) or "NULL"
+        hits = {path for path, in self._conn.execute(
+            f"SELECT path FROM keys WHERE key IN ({marks}) AND path IN (SELECT path FROM scope) "
+            f"UNION SELECT path FROM files WHERE broken AND path IN (SELECT path FROM scope)",
+            tuple(keys),
+        )}
+        return [f for f in files if str(f.absolute()) in hits]
+
+    def key_counts(self, files: list[Path]) -> list[tuple[str, int]]:
+        """Return ``(key, number of notes)`` over *files*, most used first."""
+        self._scope(files)
+        return self._conn.execute(
+            "SELECT key, COUNT(*) AS n FROM keys WHERE path IN (SELECT path FROM scope) "
+            "GROUP BY key ORDER BY n DESC, key"
+        ).fetchall()
+
+
+def relevant_keys(steps: list[Step]) -> set[str] | None:
+    """Return the keys a note must contain for *steps* to change it, or ``None`` if any note may change."""
+    keys: set[str] = set()
+    for kind, args in steps:
+        if kind == "set_default":
+            return None  # Applies exactly where a key is missing
+        if kind in ("rename", "rewrite"):
+            keys.update(str(key) for key, _ in args)
+        else:
+            keys.update(str(key) for key in args)
+    return keys
 
-    # Re‑assemble the document
-    # default_flow_style=False ensures that lists and dicts are not dumped in a single line
-    # Mostly important for the top-level tag mapping, we need to avoid pyyaml dumping it as a single line like
-    #   {Aliases: [], Date Created: 'Friday, May 2nd 2025, 11:16:47 am'}
-    new_front_yaml = yaml.safe_dump(front_matter, default_flow_style=False, sort_keys=False)
-    new_content = f"---\n{new_front_yaml}---{parts[2]}"
 
-    try:
-        file_path.write_text(new_content, encoding="utf-8")
-    except OSError as exc:
-        raise OSError(f"Error writing file") from exc
+# ───────────────────────────────────────────────────────────────────────────────
+# Directory mode
+# ───────────────────────────────────────────────────────────────────────────────
+def find_markdown_files(root: Path, recursive: bool = False, include: list[str] | None = None,
+                        exclude: list[str] | None = None) -> list[Path]:
+    """Return the files under *root* matching any *include* glob and no *exclude* glob.
 
-    print(f"Successfully processed {file_path}")
-    return True
+    Globs are matched against the POSIX path relative to *root* (``*`` also
+    matches ``/``), so ``*.md`` finds notes at any depth and ``.obsidian/*``
+    excludes a whole folder.
+    """
+    include = include or ["*.md"]
+    exclude = exclude or []
+    candidates = root.rglob("*") if recursive else root.glob("*")
+    files = []
+    for candidate in candidates:
+        rel = candidate.relative_to(root).as_posix()
+        if (any(fnmatch.fnmatch(rel, pattern) for pattern in include)
+                and not any(fnmatch.fnmatch(rel, pattern) for pattern in exclude)
+                and candidate.is_file()):
+            files.append(candidate)
+    return sorted(files)
+
+
+def _process(job: tuple[Path, list[Step], bool]) -> tuple[Path, bool | None, str | None, dict | None]:
+    """Worker: run :func:`transform_frontmatter` and turn an exception into an error message.
+
+    Returns ``(path, changed, error, stages)``; *changed* is ``None`` when the file failed or has
+    no front matter, and *stages* holds the worker's stage timings when the run is profiled.
+    """
+    file_path, steps, profiling = job
+    instrument.start_worker(profiling)
+    try:
+        result = file_path, transform_frontmatter(file_path, steps), None
+    except Exception as exc:  # noqa: BLE001 – reported per file by the caller
+        cause = f": {exc.__cause__}" if exc.__cause__ else ""
+        result = file_path, None, f"{exc}{cause}"
+    return *result, instrument.take_stages() if profiling else None
+
+
+def process_files(files: list[Path], steps: list[Step],
+                  jobs: int = 0) -> list[tuple[Path, bool | None, str | None]]:
+    """Run :func:`_process` over *files*, on *jobs* worker processes (default: one per CPU)."""
+    jobs = min(jobs or os.cpu_count() or 1, len(files))
+    work = [(file_path, steps, instrument.enabled()) for file_path in files]
+    if jobs <= 1:
+        results = [_process(job) for job in work]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # Notes are small; hand them out in batches to keep the IPC overhead down.
+            results = list(pool.map(_process, work, chunksize=max(1, min(64, len(work) // (jobs * 4)))))
+    for *_, stages in results:
+        instrument.merge_stages(stages)
+    return [result[:3] for result in results]
 
 
 @app.command()
 def main(
     path: Path = typer.Argument(..., help="Path to a Markdown file or a directory containing Markdown files"),
-    initial_keys: list[str] = typer.Option(..., "--initial_keys", "-i", help="List of original keys to be renamed"),
-    target_keys: list[str] = typer.Option(..., "--target_keys", "-o", help="List of new keys to replace original keys"),
+    initial_keys: list[str] = typer.Option([], "--initial_keys", "-i", help="List of original keys to be renamed"),
+    target_keys: list[str] = typer.Option([], "--target_keys", "-o", help="List of new keys to replace original keys"),
+    spec: Path | None = typer.Option(None, "--spec", "-s", help="YAML/JSON file with a list of transforms to apply after the renames"),
+    recursive: bool = typer.Option(False, "--recursive", "-r", help="Also process Markdown files in sub-directories"),
+    include: list[str] = typer.Option(["*.md"], "--include", help="Glob of files to process, relative to the directory (repeatable)"),
+    exclude: list[str] = typer.Option([], "--exclude", help="Glob of files to leave alone, relative to the directory (repeatable)"),
+    jobs: int = typer.Option(0, "--jobs", "-j", help="Worker processes for directories (default: one per CPU)"),
+    index: Path = typer.Option(DEFAULT_INDEX, "--index", help="Key index used to skip notes without the affected keys"),
+    no_index: bool = typer.Option(False, "--no-index", help="Open every note instead of consulting the key index"),
+    key_counts: bool = typer.Option(False, "--key-counts", help="List the front-matter keys in the directory by usage and exit"),
 ) -> bool:
     """Renames keys in the YAML front matter of a Markdown file.
 
-    If a directory is given, the script walks it (``glob('*.md')``) and processes every ``.md`` file it finds.
+    If a directory is given, every ``.md`` file in it is processed on a pool of worker processes; with
+    ``--recursive`` its sub-directories are walked too. ``--include``/``--exclude`` globs (matched against the
+    path relative to the directory) pick the files. A failing file is reported and the rest carry on; the run ends
+    with a summary of the files scanned, changed, skipped and failed.
+
+    Only the lines of the renamed keys are rewritten; the rest of the front matter keeps its quoting, comments and
+    order; keys whose value changes are re-dumped on their own.
+
+    ``--spec`` names a YAML/JSON list of further transforms (``rename``, ``delete``, ``set_default``, ``dedupe``,
+    ``rewrite``; see :func:`compile_transforms`), applied with the renames in a single pass per file.
+
+    For directories a key index (``--index``, refreshed by size and mtime) sends the transforms only to notes that
+    contain an affected key; ``--key-counts`` lists the keys in use instead.
 
     This version supports **shallow merging** when both the original key and the
     new key already exist in the front‑matter:
@@ -187,27 +730,71 @@ def main(
         return False
 
     key_mapping = dict(zip(initial_keys, target_keys))
+    transforms = [{"rename": key_mapping}] if key_mapping else []
+    if spec is not None:
+        transforms += _load(spec.read_text(encoding="utf-8")) or []
+    if key_counts:
+        if not path.is_dir():
+            typer.echo("--key-counts needs a directory.", err=True)
+            raise typer.Exit(code=1)
+        with KeyIndex(index) as key_index:
+            md_files = find_markdown_files(path, recursive, include, exclude)
+            key_index.refresh(md_files, jobs)
+            key_index.prune(path, md_files)
+            for key, count in key_index.key_counts(md_files):
+                print(f"{count:8d}  {key}")
+        raise typer.Exit(code=0)
+    if not transforms:
+        print("Error: No key mappings or transforms provided.")
+        return False
+    try:
+        steps = compile_transforms(transforms)
+    except ValueError as exc:
+        typer.echo(f"Error in {spec}: {exc}", err=True)
+        raise typer.Exit(code=1)
 
     if path.is_file():
-        success = rename_frontmatter_keys(path, **key_mapping)
-        raise typer.Exit(code=0 if success else 1)
+        changed = transform_frontmatter(path, steps)
+        if changed is False:
+            print(f"No changes needed in {path}")
+        # A note that needs no change is a success; only a missing front matter block is not.
+        raise typer.Exit(code=1 if changed is None else 0)
 
     if path.is_dir():
-        md_files = list(path.glob("*.md"))
+        start = time.perf_counter()
+        with stage("scan"):
+            md_files = find_markdown_files(path, recursive, include, exclude)
         if not md_files:
             typer.echo("No Markdown files found in the directory.", err=True)
             raise typer.Exit(code=1)
 
-        success_count = 0
-        for md in md_files:
-            success_count += rename_frontmatter_keys(md, **key_mapping)  # Let errors propagate
-
-        print(f"Processed {success_count} out of {len(md_files)} Markdown files.")
-        raise typer.Exit(code=0)
+        keys = relevant_keys(steps)
+        if no_index or keys is None:
+            results = process_files(md_files, steps, jobs)
+        else:
+            with KeyIndex(index) as key_index:
+                with stage("index"):
+                    reread = key_index.refresh(md_files, jobs)
+                    key_index.prune(path, md_files)
+                    candidates = key_index.candidates(md_files, keys)
+                print(f"Key index: re-read {reread} changed notes; {len(candidates)} contain the affected keys.")
+                results = process_files(candidates, steps, jobs)
+                with stage("index"):
+                    key_index.refresh([md for md, ok, _ in results if ok], jobs)
+        changed = sum(1 for _, ok, _ in results if ok)
+        failed = [(md, error) for md, _, error in results if error is not None]
+        skipped = len(md_files) - changed - len(failed)
+        for md, error in failed:
+            typer.echo(f"FAIL {md}: {error}", err=True)
+
+        print(f"Scanned {len(md_files)} Markdown files: {changed} changed, {skipped} skipped, "
+              f"{len(failed)} failed in {time.perf_counter() - start:.2f} s.")
+        raise typer.Exit(code=1 if failed else 0)
 
     typer.echo("Provided path is neither a file nor a directory.", err=True)
     raise typer.Exit(code=1)
 
 
 if __name__ == '__main__':
+    instrument.setup()  # --profile[=FILE] is handled here, before typer parses the rest
     app()
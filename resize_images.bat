@@ -11,8 +11,8 @@ rem If no argument is provided, use the current directory
 if "%~1"=="" (
     python "%SCRIPT_DIR%resize_images.py" "%CURRENT_DIR%"
 ) else (
-    rem If an argument is provided, use that directory
-    python "%SCRIPT_DIR%resize_images.py" "%~1"
+    rem If arguments are provided, pass them on (the directory, then e.g. --jobs N)
+    python "%SCRIPT_DIR%resize_images.py" %*
 )
 
 if errorlevel 1 (
@@ -1,53 +1,282 @@
-from PIL import Image
+from PIL import Image, JpegImagePlugin
+import argparse
+import instrument
+from instrument import stage
+import json
 import os
+import shutil
+import struct
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def resize_image(image_path, max_width):
+# Kept in the target directory: file name -> [size, mtime_ns, width] of every image
+# known to be narrow enough, so re-runs skip them without opening them
+MANIFEST_NAME = ".resize_images.json"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
+
+# Downscaling first shrinks by a whole factor with a cheap box filter until the image
+# is within this factor of the target, then LANCZOS does the rest
+REDUCING_GAP = 3.0
+
+# Encoder settings: "format" converts the output (None keeps the input's format),
+# the per-format dicts are passed to Image.save when the output has that format
+PRESETS = {
+    "keep": {"format": None},
+    "fast": {"format": None, "PNG": {"compress_level": 1}, "WEBP": {"method": 0}, "JPEG": {}},
+    "small": {"format": None, "PNG": {"optimize": True}, "WEBP": {"method": 6}, "JPEG": {"optimize": True}},
+    "webp-lossless": {"format": "WEBP", "WEBP": {"lossless": True, "method": 6}},
+    "jpeg": {"format": "JPEG", "JPEG": {"optimize": True}},
+}
+FORMAT_EXTENSIONS = {"PNG": ".png", "WEBP": ".webp", "JPEG": ".jpg"}
+
+# EXIF tag telling viewers how to turn the stored pixels; values 5 to 8 include a
+# quarter turn, so the displayed width is the stored height
+ORIENTATION = 0x0112
+
+def png_width(image_path):
+    """Return the width from the PNG IHDR chunk (the first 24 bytes), or ``None`` if it is not a PNG."""
+    with open(image_path, "rb") as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">I", header[16:20])[0]
+
+def load_manifest(target_dir):
     try:
-        # Open the image
+        with open(os.path.join(target_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(target_dir, manifest):
+    """Write the manifest via a temporary file so an interrupted run cannot corrupt it."""
+    path = os.path.join(target_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+def display_size(img):
+    """Return ``(width, height)`` of *img* as viewers show it, after its EXIF orientation."""
+    width, height = img.size
+    if img.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+def image_width(image_path):
+    """Return the displayed image width from its header alone, or ``None`` if it cannot be read.
+
+    PNGs are measured from IHDR without checking for an (in practice unused) orientation.
+    """
+    width = png_width(image_path)
+    if width is not None:
+        return width
+    try:
+        # Image.open only parses the header; pixels are decoded on first use
         with Image.open(image_path) as img:
-            # Get the original dimensions
-            width, height = img.size
-            
-            # Check if resizing is needed
-            if width > max_width:
-                # Calculate new height maintaining aspect ratio
-                ratio = max_width / width
-                new_height = int(height * ratio)
-                
-                # Resize the image
-                resized_img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Save the resized image, overwriting the original
-                resized_img.save(image_path)
-                print(f"Resized {image_path}")
-            else:
-                print(f"Skipped {image_path} (width already <= {max_width}px)")
-                
+            return display_size(img)[0]
+    except Exception:
+        return None
+
+def resize_image(image_path, max_width, preset="keep", quality=None):
+    """Shrink *image_path* to at most *max_width* pixels wide, replacing it atomically.
+
+    The encoder settings come from :data:`PRESETS`; a preset that changes the
+    format writes the image under the new extension and removes the original.
+    *quality* applies to JPEG and lossy WebP output; without it a JPEG saved as
+    JPEG again keeps its own quantization tables (Pillow's ``quality="keep"``).
+
+    *max_width* limits the width as displayed: the EXIF orientation is kept and
+    decides which side of the stored pixels is the width. The file's EXIF data
+    and permissions carry over to the output.
+
+    Returns ``(resized, bytes_before, bytes_after, width, output_path)``; errors are raised to the caller.
+    """
+    bytes_before = os.path.getsize(image_path)
+
+    # Open the image
+    with stage("open"):
+        img = Image.open(image_path)
+    with img:
+        # Get the original dimensions, turned the way the image is shown
+        width, height = display_size(img)
+
+        # Check if resizing is needed
+        if width <= max_width:
+            return False, bytes_before, bytes_before, width, image_path
+
+        # Calculate new height maintaining aspect ratio
+        ratio = max_width / width
+        new_height = int(height * ratio)
+        size = (max_width, new_height) if img.size == (width, height) else (new_height, max_width)
+
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, which keeps huge photos out of memory
+        img.draft(img.mode, size)
+
+        # Resize the image: box-reduce by a whole factor, then LANCZOS for the final step
+        with stage("resize"):
+            resized_img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+        icc_profile = img.info.get("icc_profile")
+        exif = img.info.get("exif")
+        input_format = img.format
+        if input_format == "JPEG":
+            qtables = img.quantization
+            subsampling = JpegImagePlugin.get_sampling(img)
+
+    settings = PRESETS[preset]
+    output_format = settings["format"] or input_format
+    options = dict(settings.get(output_format, {}))
+    if quality is not None and (output_format == "JPEG" or (output_format == "WEBP" and not options.get("lossless"))):
+        options["quality"] = quality
+    if output_format == "JPEG" and input_format == "JPEG" and quality is None:
+        # A resized image is not a JPEG any more, so quality="keep" is refused; hand the
+        # encoder the source's tables instead of letting it fall back to quality 75
+        options["qtables"] = qtables
+        if subsampling != -1:
+            options["subsampling"] = subsampling
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    if exif:
+        options["exif"] = exif
+    if output_format == "JPEG" and resized_img.mode not in ("RGB", "L"):
+        resized_img = resized_img.convert("RGB")
+
+    output_path = image_path
+    if settings["format"]:
+        output_path = os.path.splitext(image_path)[0] + FORMAT_EXTENSIONS[output_format]
+        if output_path != image_path and os.path.exists(output_path):
+            raise FileExistsError(f"{output_path} already exists")
+
+    # Save the resized image next to the original, then swap it in, so a crash never leaves a truncated file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".", suffix=".tmp")
+    try:
+        with stage("save"), os.fdopen(fd, "wb") as f:
+            resized_img.save(f, format=output_format, **options)
+        # mkstemp creates the file 0600; the image keeps the original's permissions
+        shutil.copymode(image_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    if output_path != image_path:
+        os.remove(image_path)
+    return True, bytes_before, os.path.getsize(output_path), max_width, output_path
+
+def _resize_job(image_path, max_width, preset, quality, profiling=False):
+    """Worker: run :func:`resize_image` and turn an exception into an error message.
+
+    The last item is the worker's stage timings when the run is profiled.
+    """
+    instrument.start_worker(profiling)
+    try:
+        result = image_path, *resize_image(image_path, max_width, preset, quality), None
     except Exception as e:
-        print(f"Error processing {image_path}: {str(e)}")
+        result = image_path, None, 0, 0, 0, image_path, str(e)
+    return *result, instrument.take_stages() if profiling else None
+
+def scan_images(target_dir, recursive=False):
+    """Yield the directory entries of images under *target_dir* (and its sub-directories if *recursive*)."""
+    with os.scandir(target_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if recursive and not entry.name.startswith("."):
+                    yield from scan_images(entry.path, recursive)
+            elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS and entry.is_file():
+                yield entry
 
 def main():
     # Maximum width
     MAX_WIDTH = 1100
-    
-    # Get the target directory
-    target_dir = os.getcwd()  # Default to current directory
-    
-    # If a directory is provided as command line argument, use that instead
-    if len(sys.argv) > 1:
-        target_dir = sys.argv[1]
-        if not os.path.isdir(target_dir):
-            print(f"Error: '{target_dir}' is not a valid directory")
-            return
-    
-    print(f"Processing PNG files in: {target_dir}")
-    
-    # Process all PNG files in the target directory
-    for filename in os.listdir(target_dir):
-        if filename.lower().endswith('.png'):
-            image_path = os.path.join(target_dir, filename)
-            resize_image(image_path, MAX_WIDTH)
+
+    parser = argparse.ArgumentParser(description="Shrink images wider than --max-width in place.")
+    # Default to current directory
+    parser.add_argument("target_dir", nargs="?", default=os.getcwd(), help="Directory of images")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Also process sub-directories")
+    parser.add_argument("-w", "--max-width", type=int, default=MAX_WIDTH, help=f"Maximum width (default: {MAX_WIDTH})")
+    parser.add_argument("-p", "--preset", choices=PRESETS, default="keep",
+                        help="Encoder settings: keep the defaults, fast, small, or convert to webp-lossless / jpeg")
+    parser.add_argument("-q", "--quality", type=int,
+                        help="Quality for JPEG and lossy WebP output (default: a JPEG keeps its own quality)")
+    instrument.setup()
+    args = parser.parse_args()
+    MAX_WIDTH = args.max_width
+
+    target_dir = args.target_dir
+    if not os.path.isdir(target_dir):
+        print(f"Error: '{target_dir}' is not a valid directory")
+        return 1
+
+    print(f"Processing images in: {target_dir}")
+
+    start = time.perf_counter()
+    old_manifest = load_manifest(target_dir)
+    manifest = {}
+    unchanged = 0
+    resized = skipped = failed = saved = 0
+
+    def manifest_key(path):
+        return os.path.relpath(path, target_dir).replace(os.sep, "/")
+
+    # Process all images in the target directory; files the manifest vouches for
+    # are skipped on their directory entry alone, new ones are checked by their header
+    image_paths = []
+    for entry in instrument.timed("scan", scan_images(target_dir, args.recursive)):
+        key = manifest_key(entry.path)
+        st = entry.stat()
+        known = old_manifest.get(key)
+        if known and known[:2] == [st.st_size, st.st_mtime_ns] and known[2] <= MAX_WIDTH:
+            manifest[key] = known
+            unchanged += 1
+            continue
+        with stage("header", sample_rss=False):
+            width = image_width(entry.path)
+        if width is not None and width <= MAX_WIDTH:
+            manifest[key] = [st.st_size, st.st_mtime_ns, width]
+            skipped += 1
+            print(f"Skipped {entry.path} (width already <= {MAX_WIDTH}px)")
+            continue
+        image_paths.append(entry.path)
+    image_paths.sort()
+    total = len(image_paths)
+
+    # LANCZOS and the image encoders are CPU-bound, so each image goes to its own process
+    if image_paths:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, total))) as pool:
+            profiling = instrument.enabled()
+            futures = [pool.submit(_resize_job, image_path, MAX_WIDTH, args.preset, args.quality, profiling)
+                       for image_path in image_paths]
+            for done, future in enumerate(as_completed(futures), 1):
+                image_path, was_resized, bytes_before, bytes_after, width, output_path, error, stages = future.result()
+                instrument.merge_stages(stages)
+                if error is not None:
+                    failed += 1
+                    print(f"[{done}/{total}] Error processing {image_path}: {error}")
+                    continue
+                st = os.stat(output_path)
+                manifest[manifest_key(output_path)] = [st.st_size, st.st_mtime_ns, width]
+                if was_resized:
+                    resized += 1
+                    saved += bytes_before - bytes_after
+                    print(f"[{done}/{total}] Resized {output_path}")
+                else:
+                    skipped += 1
+                    print(f"[{done}/{total}] Skipped {image_path} (width already <= {MAX_WIDTH}px)")
+
+    if manifest != old_manifest:
+        save_manifest(target_dir, manifest)
+
+    elapsed = time.perf_counter() - start
+    count = unchanged + skipped + resized + failed
+    print(f"{count} images in {elapsed:.2f} s ({count / elapsed if elapsed else 0:.1f} images/s): "
+          f"{unchanged} unchanged since the last run, {resized} resized, {skipped} skipped, {failed} failed; "
+          f"saved {saved / 1024 / 1024:.2f} MB")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,4 +1,5 @@
-for %%f in (.\*.mkv) do (
-    "ffmpeg/ffmpeg" -n -i "%%f" -filter:v "setpts=PTS/60" -an -b:v 4000k "%%~nf (60x).mp4"
-)
-pause
\ No newline at end of file
+@echo off
+rem Makes "name (60x).mp4" timelapses of the .mkv files here (or of the given files/folders).
+rem Options: --speed N, --jobs N, --bitrate 4000k, --ffmpeg PATH (default: ffmpeg\ffmpeg here, else PATH)
+uv run --script "%~dp0speedup.py" %*
+pause
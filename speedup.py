@@ -0,0 +1,190 @@
+# /// script
+# requires-python = ">=3.9"
+# ///
+"""
+speedup.py – Make sped-up timelapse copies of videos without decoding every frame
+
+For a speed factor *S* only one source frame in every *S* ends up in the
+output, so frames are dropped as early as possible:
+
+* when the keyframe interval (GOP) is no longer than the gap between two
+  output frames, only keyframes are decoded (``-skip_frame nokey``);
+* otherwise an ``fps`` filter keeps one frame per gap before anything is
+  scaled or encoded.
+
+Several inputs are encoded at once on a worker pool. Outputs that already
+exist are skipped (as ``ffmpeg -n`` did in ``speedup.bat``), and the run ends
+with the source frames per second that were turned into timelapse.
+
+Usage
+-----
+python speedup.py [--speed 60] [--jobs N] [--ffmpeg PATH] [--profile[=FILE]] [<file|dir> ...]   (default: *.mkv here)
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import instrument
+from instrument import stage
+
+# speedup.bat ran the ffmpeg build in the folder it was started from
+LOCAL_FFMPEG = os.path.join("ffmpeg", "ffmpeg")
+
+# The GOP is measured over this much of the start of each input
+GOP_PROBE_SECONDS = 60
+
+VIDEO_EXTENSIONS = {".mkv", ".mp4", ".mov", ".webm", ".avi", ".flv"}
+
+
+@dataclass
+class Source:
+    path: str
+    duration: float
+    fps: float
+    gop: float  # longest keyframe interval seen, in seconds (inf if unknown)
+
+    @property
+    def frames(self) -> int:
+        return round(self.duration * self.fps)
+
+
+def _tool(ffmpeg: str, name: str) -> str:
+    """Return the *name* binary that sits next to *ffmpeg* (e.g. ``ffprobe``)."""
+    folder = os.path.dirname(ffmpeg)
+    return os.path.join(folder, name) if folder else name
+
+
+def _rate(text: str) -> float:
+    num, _, den = text.partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def probe(path: str, ffprobe: str) -> Source:
+    """Read the duration, frame rate and keyframe interval of *path*'s first video stream."""
+    info = json.loads(subprocess.check_output([
+        ffprobe, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=avg_frame_rate,r_frame_rate:format=duration", "-of", "json", path,
+    ]))
+    stream = info["streams"][0]
+    fps = _rate(stream.get("avg_frame_rate", "0/0")) or _rate(stream.get("r_frame_rate", "0/0"))
+    if fps <= 0:
+        raise ValueError(f"no usable frame rate (avg_frame_rate={stream.get('avg_frame_rate')}, "
+                         f"r_frame_rate={stream.get('r_frame_rate')})")
+
+    # Packet flags come from the container index, so this reads no pixel data
+    packets = subprocess.check_output([
+        ffprobe, "-v", "error", "-select_streams", "v:0", "-read_intervals", f"%+{GOP_PROBE_SECONDS}",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path,
+    ], text=True)
+    keyframes = sorted(
+        float(t) for t, _, flags in (line.partition(",") for line in packets.splitlines())
+        if "K" in flags and t not in ("", "N/A")
+    )
+    gop = max((b - a for a, b in zip(keyframes, keyframes[1:])), default=math.inf)
+    return Source(path, float(info["format"]["duration"]), fps, gop)
+
+
+def output_path(path: str, speed: int) -> str:
+    return f"{os.path.splitext(path)[0]} ({speed}x).mp4"
+
+
+def command(source: Source, output: str, speed: int, ffmpeg: str, bitrate: str) -> tuple[list[str], str]:
+    """Return the ffmpeg command line for *source* and the frame-dropping mode it uses."""
+    gap = speed / source.fps  # source seconds between two output frames
+    if source.gop <= gap:
+        mode = "keyframes"
+        decode = ["-skip_frame", "nokey"]
+        vf = f"setpts=PTS/{speed},fps={source.fps:g}"
+    else:
+        mode = "fps filter"
+        decode = []
+        vf = f"fps={source.fps:g}/{speed},setpts=PTS/{speed}"
+    return [
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-n",
+        *decode, "-i", source.path,
+        "-filter:v", vf, "-r", f"{source.fps:g}", "-an", "-b:v", bitrate,
+        output,
+    ], mode
+
+
+def speedup(path: str, speed: int, ffmpeg: str, bitrate: str) -> tuple[Source, str, float]:
+    """Make the timelapse of *path*; returns the probed source, the mode and the seconds taken."""
+    start = time.perf_counter()
+    with stage("ffprobe"):
+        source = probe(path, _tool(ffmpeg, "ffprobe"))
+    cmd, mode = command(source, output_path(path, speed), speed, ffmpeg, bitrate)
+    with stage("ffmpeg"):
+        subprocess.run(cmd, check=True)
+    return source, mode, time.perf_counter() - start
+
+
+def expand_inputs(paths: list[str]) -> list[str]:
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(
+                os.path.join(p, name) for name in sorted(os.listdir(p))
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and "x).mp4" not in name
+            )
+        elif any(c in p for c in "*?["):
+            # A pattern that matches nothing (like the default *.mkv in a folder
+            # without any) simply contributes no files.
+            files.extend(sorted(glob.glob(p)))
+        else:
+            files.append(p)
+    return files
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Make sped-up timelapse copies of videos.")
+    parser.add_argument("inputs", nargs="*", default=["*.mkv"], help="Videos, globs or folders (default: *.mkv)")
+    parser.add_argument("-s", "--speed", type=int, default=60, help="Speed factor (default: 60)")
+    parser.add_argument("-b", "--bitrate", default="4000k", help="Video bitrate (default: 4000k)")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Videos encoded at once (default: half the CPUs)")
+    parser.add_argument("--ffmpeg", default=LOCAL_FFMPEG if shutil.which(LOCAL_FFMPEG) else "ffmpeg",
+                        help="ffmpeg binary; ffprobe is expected next to it")
+    instrument.setup(argv)
+    args = parser.parse_args(argv)
+
+    todo = []
+    for path in expand_inputs(args.inputs):
+        if os.path.exists(output_path(path, args.speed)):
+            print(f"SKIP {path} (output exists)")
+        else:
+            todo.append(path)
+
+    start = time.perf_counter()
+    frames = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(speedup, path, args.speed, args.ffmpeg, args.bitrate): path for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                source, mode, seconds = future.result()
+            except (subprocess.CalledProcessError, OSError, ValueError, KeyError, IndexError) as exc:
+                failed += 1
+                print(f"FAIL {path}: {exc}", file=sys.stderr)
+                continue
+            frames += source.frames
+            print(f"OK   {path} ({mode}, {source.frames / seconds:.0f} source frames/s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(todo) - failed} of {len(todo)} videos in {elapsed:.2f} s: "
+          f"{frames / elapsed if elapsed else 0:.0f} source frames/s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
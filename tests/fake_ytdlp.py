@@ -0,0 +1,50 @@
+"""
+fake_ytdlp.py – Offline stand-in for yt-dlp, for ``dl.py --downloader``
+
+Understands just the three calls dl.py makes: listing the playlist, fetching a
+song into ``-P`` and post-processing it from ``--load-info-json``. The files it
+writes are placeholders named the way yt-dlp would name them. Song ``id3``
+fails to download and ``id5`` fails in post-processing.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+SONGS = {"id1": "Song One", "id2": "Song: Two", "id3": "Song Three", "id4": "Old Song", "id5": "Broken Song"}
+FAIL_DOWNLOAD = {"id3"}
+FAIL_POSTPROCESS = {"id5"}
+
+
+def main(argv: list[str]) -> int:
+    if "--flat-playlist" in argv:
+        first, last = map(int, argv[argv.index("-I") + 1].split(":"))
+        for i, (video_id, title) in enumerate(SONGS.items(), 1):
+            if first <= i <= last:
+                print(f"{video_id}\t{title}")
+        return 0
+
+    staging = Path(argv[argv.index("-P") + 1])
+    if "--load-info-json" in argv:
+        info = json.loads(Path(argv[argv.index("--load-info-json") + 1]).read_text(encoding="utf-8"))
+        if info["id"] in FAIL_POSTPROCESS:
+            return 1
+        title = info["title"]
+        (staging / f"{title}.webm").rename(staging / f"{title}.opus")
+        (staging / f"{title}.en.vtt").rename(staging / f"{title}.en.lrc")
+        (staging / f"{title}.webp").unlink()
+        return 0
+
+    video_id = argv[-1].rpartition("=")[2]
+    title = SONGS[video_id].replace(":", "：")
+    (staging / f"{title}.webm").write_bytes(b"audio")
+    if video_id in FAIL_DOWNLOAD:  # dies half-way, after the first file
+        return 1
+    (staging / f"{title}.en.vtt").write_text("subs", encoding="utf-8")
+    (staging / f"{title}.webp").write_bytes(b"image")
+    (staging / f"{title}.info.json").write_text(json.dumps({"id": video_id, "title": title}), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
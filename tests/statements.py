@@ -0,0 +1,4 @@
+"""Header rows of the bank statements the tests build with openpyxl."""
+
+BOC_HEADER = ["交易日期", "對方帳戶名稱", "業務類型", "支出金額", "存入金額", "餘額", "備註"]
+CARD_HEADER = ["交易日期", "記賬日期", "記賬幣別", "卡號", "入賬款項", "新簽賬項", "交易描述", "交易幣種", "交易金額"]
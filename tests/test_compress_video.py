@@ -0,0 +1,48 @@
+"""The bitrate search of ``compress_video.py``, with a stand-in encoder."""
+
+import pytest
+
+import compress_video
+from compress_video import Probe, crush
+
+MB = 1024 * 1024
+
+
+def _encoder(monkeypatch, size_for):
+    """Make transcode() write a file of ``size_for(bitrate)`` bytes and log the bitrates."""
+    bitrates = []
+
+    def transcode(fileInput, fileOutput, bitrate, start=0, length=0, threads=0):
+        bitrates.append(bitrate)
+        with open(fileOutput, "wb") as fh:
+            fh.truncate(size_for(bitrate))
+
+    monkeypatch.setattr(compress_video, "transcode", transcode)
+    return bitrates
+
+
+def _source(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"\0" * 1024)
+    return str(path)
+
+
+def test_falls_back_to_the_largest_attempt_that_fits(tmp_path, monkeypatch):
+    # Sizes jump from 3 MB to 12 MB, so nothing lands in the 7.3-8 MB window and
+    # the search ends on an encode that is too big.
+    bitrates = _encoder(monkeypatch, lambda b: 12 * MB if b >= 1_000_000 else 3 * MB)
+
+    result = crush(_source(tmp_path), size=8, probed=Probe(30, "h264", 1920, 1080), log=lambda _: None)
+
+    assert result.afterSizeBytes == 3 * MB
+    assert (tmp_path / "clip.crushed.mp4").stat().st_size == 3 * MB
+    assert bitrates[-1] < 1_000_000
+
+
+def test_fails_when_no_attempt_fits(tmp_path, monkeypatch):
+    _encoder(monkeypatch, lambda b: 20 * MB)
+
+    with pytest.raises(RuntimeError, match="could not get .* under 8 MB"):
+        crush(_source(tmp_path), size=8, probed=Probe(30, "h264", 1920, 1080), log=lambda _: None)
+
+    assert not (tmp_path / "clip.crushed.mp4").exists()
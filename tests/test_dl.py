@@ -0,0 +1,34 @@
+"""The download pipeline of ``dl.py``, run offline against ``fake_ytdlp.py``."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import dl
+
+FAKE_YTDLP = Path(__file__).parent / "fake_ytdlp.py"
+
+
+def _run(folder, *args):
+    downloader = subprocess.list2cmdline([sys.executable, str(FAKE_YTDLP)])
+    return dl.main([*args, "--folder", str(folder), "--downloader", downloader, "-j", "2"])
+
+
+def test_downloads_and_archives(tmp_path, capsys):
+    (tmp_path / "Old Song.opus").write_bytes(b"from dl.bat")
+
+    assert _run(tmp_path, "1", "5") == 1  # id3 and id5 fail
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        ".dl-archive.txt", "Old Song.opus", "Song One.en.lrc", "Song One.opus", "Song： Two.en.lrc", "Song： Two.opus",
+    ]
+    archive = (tmp_path / ".dl-archive.txt").read_text(encoding="utf-8").split("\n")
+    assert sorted(archive) == ["", "youtube id1", "youtube id2", "youtube id4"]
+    out = capsys.readouterr()
+    assert "FAIL Song Three: download" in out.err
+    assert "FAIL Broken Song: post-processing" in out.err
+
+    # The failed songs left nothing behind and are tried again; the rest are skipped.
+    assert _run(tmp_path, "1", "5") == 1
+    assert "0 of 2 songs" in capsys.readouterr().out
+    assert not (tmp_path / dl.STAGING_NAME).exists()
@@ -0,0 +1,53 @@
+"""Duplicate detection across overlapping statements (``ExportIndex``)."""
+
+import openpyxl
+import pytest
+
+import boc2ynab
+import boccredit2ynab
+from statements import BOC_HEADER, CARD_HEADER
+from ynab_common import ExportIndex
+
+
+def _boc(path, account):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["賬號", account])
+    ws.append([])
+    ws.append(BOC_HEADER)
+    ws.append(["2024-01-02", "Starbucks", "扣賬卡消費", "38.00", None, "1,000.00", None])
+    wb.save(path)
+    return str(path)
+
+
+def _lines(path):
+    return path.read_text(encoding="utf-8").splitlines()
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_boc_accounts_do_not_collide(tmp_path, engine):
+    out = tmp_path / "out.csv"
+    with ExportIndex(tmp_path / "index.sqlite") as index:
+        first = boc2ynab.convert(_boc(tmp_path / "a.xlsx", "11-11"), str(out), index, engine=engine)
+        other = boc2ynab.convert(_boc(tmp_path / "b.xlsx", "22-22"), str(out), index, engine=engine)
+        again = boc2ynab.convert(_boc(tmp_path / "c.xlsx", "11-11"), str(out), index, engine=engine)
+    assert (first, other, again) == (1, 1, 0)
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_boccredit_cards_do_not_collide(tmp_path, engine):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(CARD_HEADER)
+    for card in ("5XXX-1111", "5XXX-2222"):
+        ws.append(["2024-01-02", "2024-01-03", "MOP", card, None, "MOP 38.00", "Starbucks", "MOP", "MOP 38.00"])
+    wb.save(tmp_path / "card.xlsx")
+
+    out = tmp_path / "out.csv"
+    with ExportIndex(tmp_path / "index.sqlite") as index:
+        assert boccredit2ynab.convert(tmp_path / "card.xlsx", out, index, engine=engine) == 2
+        assert _lines(out)[1:] == [
+            "01/02/2024,Starbucks,5XXX-1111,38.00,",
+            "01/02/2024,Starbucks,5XXX-2222,38.00,",
+        ]
+        assert boccredit2ynab.convert(tmp_path / "card.xlsx", out, index, engine=engine) == 0
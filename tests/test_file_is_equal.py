@@ -0,0 +1,90 @@
+"""Grouping, exit codes and the hash cache of ``file_is_equal.py``."""
+
+import os
+
+import pytest
+
+import file_is_equal
+from file_is_equal import PARTIAL_BYTES, HashCache, find_identical, main
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Record which files each hashing stage reads."""
+    calls = {"partial": [], "full": []}
+    for column in calls:
+        real = getattr(file_is_equal, f"{column}_hash")
+        monkeypatch.setattr(
+            file_is_equal, f"{column}_hash",
+            lambda path, size, real=real, seen=calls[column]: seen.append(os.path.basename(path)) or real(path, size),
+        )
+    return calls
+
+
+def _write(directory, name, data):
+    (directory / name).write_bytes(data)
+    return str(directory / name)
+
+
+def test_changed_file_replaces_its_row(tmp_path):
+    with HashCache(tmp_path / "cache.sqlite") as cache:
+        cache.put(("a", 10, 1), "partial", "p1")
+        cache.put(("a", 10, 1), "full", "f1")
+        assert cache.get(("a", 10, 1), "partial") == "p1"
+
+        # A new version of the file: one row per path, and the old full hash is gone.
+        cache.put(("a", 10, 2), "partial", "p2")
+        assert cache.get(("a", 10, 1), "partial") is None
+        assert cache.get(("a", 10, 2), "partial") == "p2"
+        assert cache.get(("a", 10, 2), "full") is None
+        assert cache._conn.execute("SELECT COUNT(*) FROM files").fetchone() == (1,)
+
+
+def test_files_are_narrowed_by_size_then_partial_then_full_hash(tmp_path, hashed):
+    big = bytearray(3 * PARTIAL_BYTES)
+    middle = bytearray(big)
+    middle[len(big) // 2] = 1  # same size, head and tail: only the full hash tells them apart
+    files = [
+        _write(tmp_path, "lonely", b"x" * 7),
+        _write(tmp_path, "small1", b"abc"),
+        _write(tmp_path, "small2", b"abc"),
+        _write(tmp_path, "other", b"abd"),
+        _write(tmp_path, "big1", bytes(big)),
+        _write(tmp_path, "big2", bytes(big)),
+        _write(tmp_path, "middle", bytes(middle)),
+    ]
+    with HashCache(None) as cache:
+        sets, errors = find_identical(files, cache, jobs=2)
+
+    assert errors == {}
+    assert sets == [[files[4], files[5]], [files[1], files[2]]]
+    assert sorted(hashed["partial"]) == ["big1", "big2", "middle", "other", "small1", "small2"]
+    assert sorted(hashed["full"]) == ["big1", "big2", "middle"]
+
+
+def test_cached_hashes_are_not_recomputed(tmp_path, hashed):
+    files = [_write(tmp_path, "a", b"same"), _write(tmp_path, "b", b"same")]
+    with HashCache(tmp_path / "cache.sqlite") as cache:
+        find_identical(files, cache, jobs=1)
+        find_identical(files, cache, jobs=1)
+    assert sorted(hashed["partial"]) == ["a", "b"]
+
+
+@pytest.mark.parametrize(
+    ("contents", "code", "message"),
+    [
+        ([b"same", b"same", b"same"], 0, "All 3 files are identical."),
+        ([b"same", b"same", b"diff"], 2, "NOT identical: 3 files, 1 identical sets covering 2 files."),
+        ([b"one", b"two"], 2, "NOT identical: 2 files, 0 identical sets covering 0 files."),
+    ],
+)
+def test_exit_codes(tmp_path, capsys, contents, code, message):
+    paths = [_write(tmp_path, f"f{n}", data) for n, data in enumerate(contents)]
+    assert main([*paths, "--no-cache"]) == code
+    assert message in capsys.readouterr().out
+
+
+def test_missing_file_is_an_error(tmp_path, capsys):
+    path = _write(tmp_path, "a", b"x")
+    assert main([path, str(tmp_path / "missing"), "--no-cache"]) == 1
+    assert "missing" in capsys.readouterr().err
@@ -0,0 +1,54 @@
+"""Accounts in the transaction ledger (``Ledger``)."""
+
+import openpyxl
+import pytest
+
+import boc2ynab
+import boccredit2ynab
+import ynab_ledger
+from statements import BOC_HEADER, CARD_HEADER
+from ynab_common import Ledger
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+def test_rows_are_kept_per_account_and_card(tmp_path, engine):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(CARD_HEADER)
+    for card in ("5XXX-1111", "5XXX-2222"):
+        ws.append(["2024-01-02", "2024-01-03", "MOP", card, None, "MOP 38.00", "Starbucks", "MOP", "MOP 38.00"])
+    wb.save(tmp_path / "card.xlsx")
+    for name, account in (("a", "11-11"), ("b", "22-22")):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["賬號", account])
+        ws.append(BOC_HEADER)
+        ws.append(["2024-01-02", "Starbucks", "扣賬卡消費", "38.00", None, "1,000.00", None])
+        wb.save(tmp_path / f"{name}.xlsx")
+
+    out = str(tmp_path / "out.csv")
+    with Ledger(tmp_path / "ledger.sqlite") as ledger:
+        for _ in range(2):  # the second round adds nothing
+            boccredit2ynab.convert(tmp_path / "card.xlsx", out, ledger=ledger, engine=engine)
+            for name in ("a", "b"):
+                boc2ynab.convert(str(tmp_path / f"{name}.xlsx"), out, ledger=ledger, engine=engine)
+
+        assert [name for name, *_ in ledger.totals("account")] == [
+            "boc:11-11", "boc:22-22", "boccredit:5XXX-1111", "boccredit:5XXX-2222",
+        ]
+        assert ledger.totals("year", accounts=["boc"]) == [("2024", 2, 76.0, 0.0)]
+        assert ledger.totals("year", accounts=["boccredit:5XXX-2222"]) == [("2024", 1, 38.0, 0.0)]
+
+
+@pytest.mark.parametrize("bound", ["2020-13", "2021-02-29", "2020-1", "20201", "May"])
+def test_bad_date_bound_is_a_usage_error(tmp_path, capsys, bound):
+    with pytest.raises(SystemExit) as exit_info:
+        ynab_ledger.main(["--ledger", str(tmp_path / "ledger.sqlite"), "totals", "--from", bound])
+    assert exit_info.value.code == 2
+    assert f"not a date: {bound!r}" in capsys.readouterr().err
+    assert not (tmp_path / "ledger.sqlite").exists()
+
+
+@pytest.mark.parametrize("bound", ["2020", "2020-12", "2024-02-29"])
+def test_good_date_bound_is_accepted(tmp_path, bound):
+    assert ynab_ledger.main(["--ledger", str(tmp_path / "ledger.sqlite"), "totals", "--from", bound, "--to", bound]) == 0
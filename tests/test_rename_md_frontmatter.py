@@ -0,0 +1,122 @@
+"""Rewriting notes in place (``rename_md_frontmatter.py``)."""
+
+import os
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rename_md_frontmatter import compile_transforms, rename_frontmatter_keys, transform_frontmatter
+
+SCRIPT = Path(__file__).resolve().parent.parent / "rename_md_frontmatter.py"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+def test_rewrite_keeps_permissions(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("---\ntitle: Hello\ntag: a\n---\nBody\n", encoding="utf-8")
+    os.chmod(note, 0o644)
+
+    assert rename_frontmatter_keys(note, tag="tags")
+
+    assert note.read_text(encoding="utf-8") == "---\ntitle: Hello\ntags: a\n---\nBody\n"
+    assert stat.S_IMODE(note.stat().st_mode) == 0o644
+
+
+@pytest.mark.parametrize(
+    ("text", "code", "message"),
+    [
+        ("---\ntitle: Hello\n---\nBody\n", 0, "No changes needed"),
+        ("---\ntag: a\n---\nBody\n", 0, "Successfully processed"),
+        ("Body only\n", 1, "No front matter found"),
+    ],
+)
+def test_single_file_exit_codes(tmp_path, text, code, message):
+    note = tmp_path / "note.md"
+    note.write_text(text, encoding="utf-8")
+
+    proc = subprocess.run(
+        [sys.executable, str(SCRIPT), str(note), "-i", "tag", "-o", "tags"],
+        capture_output=True, text=True, encoding="utf-8",
+    )
+
+    assert proc.returncode == code
+    assert message in proc.stdout
+
+
+def _rename(tmp_path, front, **renames):
+    note = tmp_path / "note.md"
+    note.write_text(f"---\n{front}---\nBody\n", encoding="utf-8")
+    assert rename_frontmatter_keys(note, **renames)
+    return note.read_text(encoding="utf-8")
+
+
+def test_rename_keeps_comments_and_order(tmp_path):
+    front = "# keep me\ntitle: Hello  # inline\ntag: a\nz: 1\n"
+    assert _rename(tmp_path, front, tag="tags") == "---\n# keep me\ntitle: Hello  # inline\ntags: a\nz: 1\n---\nBody\n"
+
+
+def test_rename_keeps_multiline_values(tmp_path):
+    front = "title: Hello\nsummary: |\n  line one\n  line two\ntag: a\n"
+    assert _rename(tmp_path, front, summary="abstract") == (
+        "---\ntitle: Hello\nabstract: |\n  line one\n  line two\ntag: a\n---\nBody\n"
+    )
+
+
+def test_rename_keeps_anchors_and_aliases(tmp_path):
+    front = "base: &b [1, 2]\ntag: *b\nx: 1\n"
+    assert _rename(tmp_path, front, x="y") == "---\nbase: &b [1, 2]\ntag: *b\ny: 1\n---\nBody\n"
+
+
+def test_merge_away_an_anchor_falls_back_to_a_full_dump(tmp_path):
+    # Dropping the ``base`` line leaves ``*b`` without its anchor, so the edited text no longer parses
+    front = "base: &b [1, 2]\ntag: *b\ntags: [3]\n"
+    assert _rename(tmp_path, front, base="tags") == "---\ntag:\n- 1\n- 2\ntags:\n- 3\n- 1\n- 2\n---\nBody\n"
+
+
+def _transform(tmp_path, front, spec):
+    note = tmp_path / "note.md"
+    note.write_text(f"---\n{front}---\nBody\n", encoding="utf-8")
+    transform_frontmatter(note, compile_transforms(spec))
+    return note.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    ("front", "spec", "expected"),
+    [
+        ("title: A\nstatus: draft\n", [{"delete": ["status", "missing"]}], "title: A\n"),
+        ("title: A\n", [{"set_default": {"title": "X", "status": "new"}}], "title: A\nstatus: new\n"),
+        ("tags: [b, a, b]\n", [{"dedupe": ["tags"]}], "tags:\n- b\n- a\n"),
+        ("title: A\ntags: [a, b]\n", [{"rewrite": {"title": {"A": "Z"}, "tags": {"a": "c"}}}], "title: Z\ntags:\n- c\n- b\n"),
+    ],
+)
+def test_each_operation(tmp_path, front, spec, expected):
+    assert _transform(tmp_path, front, spec) == f"---\n{expected}---\nBody\n"
+
+
+@pytest.mark.parametrize(
+    ("spec", "expected"),
+    [
+        ([{"rewrite": {"tags": {"a": "b"}}}, {"dedupe": ["tags"]}], "tags:\n- b\n"),
+        ([{"dedupe": ["tags"]}, {"rewrite": {"tags": {"a": "b"}}}], "tags:\n- b\n- b\n"),
+    ],
+)
+def test_operations_run_in_order(tmp_path, spec, expected):
+    assert _transform(tmp_path, "tags: [a, b]\n", spec) == f"---\n{expected}---\nBody\n"
+
+
+def test_delete_then_set_default_replaces_a_value(tmp_path):
+    spec = [{"delete": ["status"]}, {"set_default": {"status": "new"}}]
+    assert _transform(tmp_path, "status: draft\ntitle: A\n", spec) == "---\ntitle: A\nstatus: new\n---\nBody\n"
+
+
+def test_delete_an_anchored_key(tmp_path):
+    assert _transform(tmp_path, "base: &b [1, 2]\ntag: *b\n", [{"delete": ["base"]}]) == "---\ntag:\n- 1\n- 2\n---\nBody\n"
+
+
+@pytest.mark.parametrize("spec", [[{"explode": ["x"]}], [{"delete": "x"}], [{"rewrite": {"x": "y"}}], [{"delete": [], "dedupe": []}]])
+def test_bad_spec_is_rejected(spec):
+    with pytest.raises(ValueError):
+        compile_transforms(spec)
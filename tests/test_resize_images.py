@@ -0,0 +1,52 @@
+"""Shrinking images in place (``resize_images.py``)."""
+
+import os
+import stat
+import sys
+
+import pytest
+from PIL import Image
+
+from resize_images import ORIENTATION, image_width, resize_image
+
+
+def _jpeg(path, size, orientation=None, quality=92):
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    Image.new("RGB", size, (200, 80, 40)).save(path, quality=quality, exif=exif)
+    return str(path)
+
+
+def test_limit_applies_to_the_displayed_width(tmp_path):
+    # Stored 600x1400 but turned a quarter by the EXIF orientation: shown 1400 wide.
+    path = _jpeg(tmp_path / "portrait.jpg", (600, 1400), orientation=6)
+    assert image_width(path) == 1400
+
+    resized, *_, width, output = resize_image(path, 1100)
+
+    assert (resized, width) == (True, 1100)
+    with Image.open(output) as img:
+        assert img.size == (471, 1100)
+        assert img.getexif()[ORIENTATION] == 6
+
+
+def test_jpeg_keeps_its_quality(tmp_path):
+    path = _jpeg(tmp_path / "photo.jpg", (2000, 1000), quality=95)
+    with Image.open(path) as img:
+        tables = img.quantization
+
+    resize_image(path, 1100)
+
+    with Image.open(path) as img:
+        assert img.quantization == tables
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+def test_resize_keeps_permissions(tmp_path):
+    path = _jpeg(tmp_path / "photo.jpg", (2000, 1000))
+    os.chmod(path, 0o644)
+
+    resize_image(path, 1100)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
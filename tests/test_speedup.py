@@ -0,0 +1,36 @@
+"""Probing sources in ``speedup.py``, with a stand-in ffprobe."""
+
+import json
+
+import pytest
+
+import speedup
+
+
+def _ffprobe(monkeypatch, stream):
+    """Make ffprobe report *stream* and a keyframe every second."""
+    def check_output(cmd, text=False):
+        if "-read_intervals" in cmd:
+            return "0.000000,K_\n1.000000,K_\n2.000000,K_\n"
+        return json.dumps({"streams": [stream], "format": {"duration": "10.0"}}).encode()
+
+    monkeypatch.setattr(speedup.subprocess, "check_output", check_output)
+
+
+@pytest.mark.parametrize(
+    ("stream", "fps"),
+    [
+        ({"avg_frame_rate": "30000/1001", "r_frame_rate": "30/1"}, 30000 / 1001),
+        ({"avg_frame_rate": "0/0", "r_frame_rate": "25/1"}, 25.0),
+    ],
+)
+def test_probe_frame_rate(monkeypatch, stream, fps):
+    _ffprobe(monkeypatch, stream)
+    source = speedup.probe("clip.mp4", "ffprobe")
+    assert (source.fps, source.gop, source.duration) == (pytest.approx(fps), 1.0, 10.0)
+
+
+def test_probe_rejects_a_missing_frame_rate(monkeypatch):
+    _ffprobe(monkeypatch, {"avg_frame_rate": "0/0", "r_frame_rate": "0/0"})
+    with pytest.raises(ValueError, match="frame rate"):
+        speedup.probe("clip.mp4", "ffprobe")
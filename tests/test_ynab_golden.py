@@ -0,0 +1,40 @@
+"""
+Regression tests for the ``*2ynab.py`` converters.
+
+The golden CSVs in ``tests/data`` were written by the original
+``pd.read_excel``-based converters from statements built with
+``bench_ynab.generate``; both engines have to reproduce them byte for byte.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+import bench_ynab
+import boc2ynab
+import boccredit2ynab
+import mpay2ynab
+
+DATA = Path(__file__).parent / "data"
+ROWS = 60
+
+CONVERTERS = {
+    "boc": boc2ynab.convert,
+    "boccredit": boccredit2ynab.convert,
+    "mpay": mpay2ynab.convert,
+}
+
+
+@pytest.mark.parametrize("engine", ["python", "pandas"])
+@pytest.mark.parametrize("kind", sorted(CONVERTERS))
+def test_matches_golden_csv(tmp_path, kind, engine):
+    infile = bench_ynab.generate(tmp_path, kind, ROWS)
+    outfile = tmp_path / f"{kind}.csv"
+
+    written = CONVERTERS[kind](str(infile), str(outfile), engine=engine)
+
+    # The converters end lines with os.linesep, as to_csv did.
+    golden = (DATA / f"{kind}-{ROWS}.csv").read_bytes().replace(b"\r\n", b"\n")
+    assert outfile.read_bytes() == golden.replace(b"\n", os.linesep.encode())
+    assert written == golden.count(b"\n") - 1
@@ -0,0 +1,758 @@
+"""
+ynab_common.py – Helpers shared by the ``*2ynab.py`` statement converters.
+
+Statements are streamed row by row (:func:`iter_rows`) and :func:`sniff`
+recognises which bank produced one from its header row alone, handing the rows
+it already read back to the matching converter so nothing is parsed twice.
+
+Every converter ends up with the same two chores: turning whatever the bank
+put in the date column into YNAB's ``MM/DD/YYYY`` and turning amount strings
+like ``"MOP 1,234.56"`` into plain numbers. Both come in two flavours that give
+identical results: column-at-a-time versions for pandas, used on large
+statements, and per-cell versions for the pure-Python path that small
+statements take. pandas and numpy are only imported once they are needed,
+which for a typical month-long statement is never.
+
+:class:`ExportIndex` remembers which statements and transactions were already
+exported, so overlapping bank downloads do not produce duplicate YNAB rows.
+:class:`Ledger` keeps every converted transaction, partitioned by month, so
+history can be exported or totalled again without the original statements.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Constants
+# ──────────────────────────────────────────────────────────────────────────────
+
+YNAB_COLUMNS = ["Date", "Payee", "Memo", "Outflow", "Inflow"]
+
+Row = list["str | None"]
+
+# Header cells that identify each layout. BOC is recognised by '交易日期' in
+# the first column, which the credit-card sheet also has, so it is tried last.
+HEADER_MARKERS = {
+    "boccredit": {"新簽賬項", "入賬款項"},
+    "mpay": {"餘額/快捷支付", "分類"},
+    "boc": {"交易日期"},
+}
+
+# The header has to show up within this many rows, so a file handed to the
+# wrong converter fails straight away instead of after parsing everything.
+SNIFF_ROWS = 30
+
+# Strings ``pd.read_excel`` treats as missing by default.
+_NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+
+# Statements with fewer data rows than this are converted without pandas.
+SMALL_ROWS = 5_000
+
+ENGINES = ("auto", "python", "pandas")
+
+# Layouts seen in BOC and MPay exports, tried in order with one vectorised
+# ``pd.to_datetime`` call each. Anything left over goes through the scalar
+# parser so unusual values keep the exact same result as before.
+DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+)
+
+# Range of ``pd.Timestamp``; dates outside it are left as strings by pandas.
+_TIMESTAMP_MIN = datetime(1677, 9, 22)
+_TIMESTAMP_MAX = datetime(2262, 4, 11)
+
+_CURRENCY_PREFIX = re.compile(r"(?s)^.*\s")
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Reading
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _cell_str(val) -> str | None:
+    """Return *val* the way ``pd.read_excel(dtype=str)`` would render it."""
+    if val is None:
+        return None
+    if isinstance(val, float) and val.is_integer():
+        val = int(val)
+    val = str(val)
+    return None if val in _NA_STRINGS else val
+
+
+def iter_rows(infile: str | Path) -> Iterator[Row]:
+    """Yield the rows of the first worksheet in *infile*, one at a time.
+
+    xlsx files are streamed with openpyxl's read-only mode; legacy xls files
+    are walked row by row with xlrd. A row without any cell content comes out
+    as ``[]``, which :func:`iter_records` tells apart from a row of NA strings.
+    """
+    with open(infile, "rb") as fh:
+        is_xlsx = fh.read(4) == b"PK\x03\x04"
+
+    if is_xlsx:
+        import openpyxl
+
+        wb = openpyxl.load_workbook(infile, read_only=True, data_only=True)
+        try:
+            for row in wb.worksheets[0].iter_rows(values_only=True):
+                if all(v in (None, "") for v in row):
+                    yield []
+                    continue
+                yield [_cell_str(v) for v in row]
+        finally:
+            wb.close()
+        return
+
+    import xlrd
+
+    book = xlrd.open_workbook(infile, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for i in range(sheet.nrows):
+            cells = sheet.row(i)
+            if all(c.value in (None, "") for c in cells):
+                yield []
+                continue
+            yield [
+                _cell_str(xlrd.xldate_as_datetime(c.value, book.datemode)
+                          if c.ctype == xlrd.XL_CELL_DATE else c.value)
+                for c in cells
+            ]
+    finally:
+        book.release_resources()
+
+
+def is_header(kind: str, row: Row) -> bool:
+    """Return ``True`` if *row* is the header row of a *kind* statement."""
+    if kind == "boc":
+        return bool(row) and str(row[0]).strip() == "交易日期" and not is_header("boccredit", row)
+    cells = {str(v).strip() for v in row if v is not None}
+    return HEADER_MARKERS[kind] <= cells
+
+
+def sniff(infile: str | Path, max_rows: int = SNIFF_ROWS) -> tuple[str, Iterator[Row]]:
+    """Work out which layout *infile* has from its first *max_rows* rows.
+
+    Returns the layout (a key of :data:`HEADER_MARKERS`) and an iterator over
+    *all* rows of the sheet, including the ones already looked at, so the
+    converter can carry on without opening the file again.
+    """
+    rows = iter_rows(infile)
+    head: list[Row] = []
+    for row in islice(rows, max_rows):
+        head.append(row)
+        for kind in HEADER_MARKERS:
+            if is_header(kind, row):
+                return kind, chain(head, rows)
+    rows.close()
+    raise ValueError(f"unrecognised statement layout (no known header in the first {max_rows} rows)")
+
+
+def find_header(kind: str, rows: Iterator[Row], preamble: list[Row] | None = None) -> list[str]:
+    """Consume *rows* up to the *kind* header row and return its column names.
+
+    The rows above the header are appended to *preamble*, if given.
+    """
+    for row in islice(rows, SNIFF_ROWS):
+        if is_header(kind, row):
+            columns: list[str] = []
+            for i, val in enumerate(row):
+                name = f"Unnamed: {i}" if val is None else val
+                # Mangle duplicates the same way pandas does ("名稱", "名稱.1", …).
+                dup, n = name, 0
+                while dup in columns:
+                    n += 1
+                    dup = f"{name}.{n}"
+                columns.append(dup)
+            return columns
+        if preamble is not None:
+            preamble.append(row)
+    markers = "/".join(f"'{m}'" for m in sorted(HEADER_MARKERS[kind]))
+    raise RuntimeError(f"Header row with {markers} not found.")
+
+
+def account_number(preamble: Iterable[Row]) -> str | None:
+    """Return the account number ('賬號') in the rows above a BOC header, if any.
+
+    It is either in the cell after the label or in the label cell itself
+    ("賬號：12-34-56-789012").
+    """
+    for row in preamble:
+        cells = [v.strip() for v in row if v is not None and v.strip()]
+        for i, cell in enumerate(cells):
+            if cell.startswith("賬號"):
+                number = cell[len("賬號"):].lstrip(":： ")
+                if number:
+                    return number
+                if i + 1 < len(cells):
+                    return cells[i + 1]
+    return None
+
+
+def iter_records(rows: Iterator[Row], width: int) -> Iterator[Row]:
+    """Yield *rows* padded or cut to *width* cells, as read_excel would.
+
+    Like read_excel, empty rows (``[]`` from :func:`iter_rows`) between records
+    are kept as all-NA records, and only those after the last record are
+    dropped. Rows of NA strings such as ``"N/A"`` always count as records.
+    """
+    blank: list[Row] = []
+    for row in rows:
+        record = (row + [None] * width)[:width]
+        if not row:
+            blank.append(record)
+            continue
+        yield from blank
+        blank.clear()
+        yield record
+
+
+def getter(columns: list[str], name: str, required: bool = True) -> Callable[[Row], str | None]:
+    """Return a function picking column *name* out of a record.
+
+    A missing column raises :class:`KeyError` (like indexing a DataFrame) when
+    *required*, and otherwise reads as empty (like ``DataFrame.reindex``).
+    """
+    if name in columns:
+        i = columns.index(name)
+        return lambda record: record[i]
+    if required:
+        raise KeyError(name)
+    return lambda record: None
+
+
+def pick_engine(records: Iterator[Row], engine: str = "auto") -> tuple[str, Iterator[Row]]:
+    """Resolve *engine* to ``"python"`` or ``"pandas"`` for *records*.
+
+    ``"auto"`` looks ahead up to :data:`SMALL_ROWS` records and only picks
+    pandas when the statement is at least that long. The returned iterator
+    still yields every record.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}, not {engine!r}")
+    if engine != "auto":
+        return engine, records
+    head = list(islice(records, SMALL_ROWS))
+    return ("python" if len(head) < SMALL_ROWS else "pandas"), chain(head, records)
+
+
+def _frame(block: list[Row], columns: list[str]) -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+
+    # Empty cells become NaN, exactly like read_excel, so str() of them stays
+    # "nan". Swapping them in before pandas sees the values keeps every column
+    # object dtype; fillna() would downcast an all-empty column to float64.
+    values = np.array(block, dtype=object).reshape(len(block), len(columns))
+    values[values == None] = np.nan  # noqa: E711 – elementwise comparison
+    return pd.DataFrame(values, columns=columns, copy=False)
+
+
+def read_frames(columns: list[str], records: Iterator[Row], chunk_rows: int | None = None) -> Iterator[pd.DataFrame]:
+    """Yield *records* as string DataFrames with the given *columns*.
+
+    With *chunk_rows* the table comes in blocks of that many rows, otherwise
+    as a single frame; at least one (possibly empty) frame is always yielded.
+    """
+    block: list[Row] = []
+    emitted = False
+    for record in records:
+        block.append(record)
+        if chunk_rows and len(block) >= chunk_rows:
+            yield _frame(block, columns)
+            block, emitted = [], True
+    if block or not emitted:
+        yield _frame(block, columns)
+
+
+def read_frame(columns: list[str], records: Iterator[Row]) -> pd.DataFrame:
+    """Return all of *records* as one DataFrame."""
+    return next(read_frames(columns, records))
+
+
+def write_csv(outfile: str | Path, rows: Iterable[list[str | None]]) -> None:
+    """Write YNAB *rows* to *outfile* exactly as ``DataFrame.to_csv`` would."""
+    with open(outfile, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh, lineterminator=os.linesep)
+        writer.writerow(YNAB_COLUMNS)
+        writer.writerows(rows)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Dates
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _format_mdy(stamps: np.ndarray) -> np.ndarray:
+    """Format a ``datetime64`` array as ``MM/DD/YYYY`` without a per-item strftime."""
+    import numpy as np
+
+    iso = np.datetime_as_string(stamps.astype("datetime64[D]")).astype("U10")
+    chars = iso.view("U1").reshape(-1, 10)  # "YYYY-MM-DD" split into characters
+    slash = np.full((len(chars), 1), "/")
+    mdy = np.concatenate([chars[:, 5:7], slash, chars[:, 8:10], slash, chars[:, :4]], axis=1)
+    return np.ascontiguousarray(mdy).view("U10").ravel().astype(object)
+
+
+def _normalise_date(value) -> str:
+    """Return *value* formatted as ``MM/DD/YYYY`` or the original string.
+
+    Accepts ``pandas.NA``, :class:`datetime.datetime` or arbitrary strings.
+    Missing values become blank; anything that cannot be parsed as a date is
+    returned unchanged.
+    """
+    import pandas as pd
+
+    if pd.isna(value):
+        return ""
+
+    if isinstance(value, datetime):
+        return value.strftime("%m/%d/%Y")
+
+    try:
+        return pd.to_datetime(value).strftime("%m/%d/%Y")
+    except Exception:  # noqa: BLE001
+        return str(value)
+
+
+def normalise_date(value: str | None) -> str:
+    """Pure-Python :func:`_normalise_date` for one cell of a small statement.
+
+    The usual layouts are parsed with :func:`datetime.strptime`. Only values
+    that might still be a date in some other spelling are handed to pandas,
+    so it is not imported for ordinary statements or for footer rows such
+    as '合計'.
+    """
+    if value is None:
+        return ""
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if _TIMESTAMP_MIN <= parsed < _TIMESTAMP_MAX:
+            return parsed.strftime("%m/%d/%Y")
+        break
+    # Without digits or Latin letters (month names, "today") it cannot be a date.
+    if not any(c.isdigit() or (c.isascii() and c.isalpha()) for c in value):
+        return value
+    return _normalise_date(value)
+
+
+def normalise_dates(values: pd.Series) -> pd.Series:
+    """Vectorised :func:`_normalise_date` over a whole column."""
+    import numpy as np
+    import pandas as pd
+
+    vals = values.to_numpy(dtype=object)
+    result = np.full(len(vals), "", dtype=object)
+    pending = ~pd.isna(vals)
+
+    for fmt in DATE_FORMATS:
+        if not pending.any():
+            break
+        parsed = pd.to_datetime(pd.Series(vals[pending]), format=fmt, errors="coerce")
+        hit = parsed.notna().to_numpy()
+        idx = np.flatnonzero(pending)[hit]
+        result[idx] = _format_mdy(parsed[hit].to_numpy())
+        pending[idx] = False
+
+    # Stragglers (footer rows, odd layouts) keep the per-value rules.
+    idx = np.flatnonzero(pending)
+    result[idx] = [_normalise_date(v) for v in vals[idx]]
+
+    return pd.Series(result, index=values.index)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Amounts
+# ──────────────────────────────────────────────────────────────────────────────
+
+def normalise_amount(value: str | None, strip_currency: bool = False) -> str:
+    """Pure-Python :func:`normalise_amounts` for one cell of a small statement."""
+    if value is None:
+        return ""
+    if strip_currency:
+        value = _CURRENCY_PREFIX.sub("", value.strip())
+    return value.replace(",", "")
+
+
+def normalise_amounts(values: pd.Series, strip_currency: bool = False) -> pd.Series:
+    """Remove thousands separators from a column of amount strings.
+
+    With *strip_currency* only the last whitespace-separated token is kept,
+    e.g. ``"USD 1,234.56"`` → ``"1234.56"``. Missing (and, when stripping,
+    blank) values become ``""``.
+    """
+    if strip_currency:
+        values = values.str.strip().str.replace(r"(?s)^.*\s", "", regex=True)
+    return values.str.replace(",", "", regex=False).fillna("")
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Export index (incremental conversion)
+# ──────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    digest      TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    exported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    account   TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    PRIMARY KEY (account, key)
+);
+CREATE INDEX IF NOT EXISTS transactions_statement ON transactions (statement);
+"""
+
+
+def file_digest(path: str | Path) -> str:
+    """Return the SHA-256 hex digest of the file at *path*."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def transaction_keys(
+    df: pd.DataFrame, carry: dict[str, int] | None = None, memo: bool = False
+) -> pd.Series:
+    """Fingerprint each YNAB row by Date/Payee/Outflow/Inflow.
+
+    Identical rows (two coffees on the same day) are told apart by a running
+    occurrence number, so they stay distinct while the same rows in an
+    overlapping statement still map to the same keys. Pass the same *carry*
+    dict for every chunk of one statement to keep that numbering continuous.
+    With *memo* the Memo column leads the key; the credit-card statement keeps
+    the card number there, so two cards' identical purchases stay apart.
+    """
+    base = (
+        (df["Memo"].fillna("").astype(str) + "|" if memo else "")
+        + df["Date"].astype(str) + "|" + df["Payee"].fillna("").astype(str)
+        + "|" + df["Outflow"].astype(str) + "|" + df["Inflow"].astype(str)
+    )
+    nth = base.groupby(base, sort=False).cumcount()
+    if carry is not None:
+        nth += base.map(carry).fillna(0).astype(int)
+        for key, count in base.value_counts(sort=False).items():
+            carry[key] = carry.get(key, 0) + count
+    return base + "|" + nth.astype(str)
+
+
+def record_keys(
+    rows: Iterable[list[str | None]], carry: dict[str, int] | None = None, memo: bool = False
+) -> list[str]:
+    """Pure-Python :func:`transaction_keys` over YNAB rows (Date, Payee, Memo, Outflow, Inflow)."""
+    seen: dict[str, int] = {} if carry is None else carry
+    keys = []
+    for date, payee, note, outflow, inflow in rows:
+        base = f"{date}|{payee or ''}|{outflow}|{inflow}"
+        if memo:
+            base = f"{note or ''}|{base}"
+        nth = seen.get(base, 0)
+        seen[base] = nth + 1
+        keys.append(f"{base}|{nth}")
+    return keys
+
+
+class ExportIndex:
+    """SQLite record of the statements and transactions already exported.
+
+    Several worker processes may share one index file; every claim runs in
+    its own short write transaction so each transaction key is handed out
+    exactly once. Keys are tagged with the *statement* they came from so a
+    failed conversion can give them back with :meth:`forget`.
+    """
+
+    def __init__(self, path: str | Path, statement: str = "") -> None:
+        self.statement = statement
+        self._conn = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> ExportIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def has_statement(self, digest: str) -> bool:
+        """Return ``True`` if a file with this content was already exported."""
+        row = self._conn.execute("SELECT 1 FROM statements WHERE digest = ?", (digest,)).fetchone()
+        return row is not None
+
+    def add_statement(self, path: str | Path) -> None:
+        """Mark the current statement (at *path*) as fully exported."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO statements (digest, path) VALUES (?, ?)",
+            (self.statement, str(path)),
+        )
+
+    def claim(self, account: str, keys: Iterable[str]) -> list[bool]:
+        """Record *keys* for *account* and return a mask of the ones not seen before.
+
+        *account* is whatever identifies the account within its bank, e.g.
+        ``"boc:12-34-56-789012"``, so equal rows of two accounts both count.
+        """
+        values = [str(k) for k in keys]
+        cur = self._conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (key TEXT)")
+            cur.execute("DELETE FROM incoming")
+            cur.executemany("INSERT INTO incoming VALUES (?)", ((k,) for k in values))
+            existing = {
+                k for (k,) in cur.execute(
+                    "SELECT i.key FROM incoming i JOIN transactions t ON t.account = ? AND t.key = i.key",
+                    (account,),
+                )
+            }
+            cur.executemany(
+                "INSERT OR IGNORE INTO transactions (account, key, statement) VALUES (?, ?, ?)",
+                ((account, k, self.statement) for k in values),
+            )
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        mask = []
+        for k in values:
+            mask.append(k not in existing)
+            existing.add(k)  # a repeat within *keys* only counts once
+        return mask
+
+    def forget(self) -> None:
+        """Release every key claimed for the current statement."""
+        self._conn.execute("DELETE FROM transactions WHERE statement = ?", (self.statement,))
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Ledger (every transaction ever converted)
+# ──────────────────────────────────────────────────────────────────────────────
+
+DEFAULT_LEDGER = Path.home() / ".ynab_ledger.sqlite"
+
+# The table is clustered on the month, so each month's transactions sit
+# together on disk and a date-range query only reads the months it covers.
+_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    month   TEXT NOT NULL,
+    account TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    date    TEXT NOT NULL,
+    payee   TEXT,
+    memo    TEXT,
+    outflow INTEGER,
+    inflow  INTEGER,
+    PRIMARY KEY (month, account, key)
+) WITHOUT ROWID;
+"""
+
+_MDY = re.compile(r"^(\d\d)/(\d\d)/(\d{4})$")
+
+LEDGER_GROUPS = {
+    "month": "month",
+    "year": "substr(month, 1, 4)",
+    "account": "account",
+    "payee": "payee",
+}
+
+
+def _ledger_text(value) -> str | None:
+    """Return *value* as text, with blanks, ``None`` and NaN as ``None``."""
+    if value is None or value != value or value == "":
+        return None
+    return str(value)
+
+
+def _cents(value) -> int | None:
+    """Parse a normalised amount such as ``"1234.5"`` into whole cents."""
+    text = _ledger_text(value)
+    if text is None:
+        return None
+    try:
+        return int((Decimal(text) * 100).to_integral_value())
+    except InvalidOperation:
+        raise ValueError(f"amount {text!r} is not a number") from None
+
+
+def _amount(cents: int | None) -> str:
+    if cents is None:
+        return ""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def check_date_bound(bound: str) -> str:
+    """Return *bound* if it is a real ``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD`` date.
+
+    Raises:
+        ValueError: If it has another shape or names no such month or day (e.g. ``2020-13``).
+    """
+    try:
+        if re.fullmatch(r"\d{4}(-\d\d){0,2}", bound):
+            datetime.strptime(bound, ("%Y", "%Y-%m", "%Y-%m-%d")[bound.count("-")])
+            return bound
+    except ValueError:
+        pass
+    raise ValueError(f"not a date: {bound!r} (use YYYY, YYYY-MM or YYYY-MM-DD)")
+
+
+def _date_bounds(start: str | None, end: str | None) -> tuple[str, str]:
+    """Turn ``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD`` bounds into an inclusive ISO date range."""
+    for bound in (start, end):
+        if bound is not None:
+            check_date_bound(bound)
+    # 2024 → 2024-01-01 .. 2024-12-31; 2024-02 → 2024-02-01 .. 2024-02-31 (fine for string comparison)
+    first, last = start or "0000", end or "9999"
+    return first + "-01-01"[len(first) - 4:], last + "-12-31"[len(last) - 4:]
+
+
+class Ledger:
+    """Append-only SQLite store of normalised YNAB rows from every statement.
+
+    Rows are tagged with the *account* they came from (the converter, plus
+    the account or card number where the statement has one, e.g.
+    ``"boc:12-34-56-789012"``) and keyed like :class:`ExportIndex`, so
+    appending an overlapping or repeated statement adds only the transactions
+    the ledger does not have yet.
+    Amounts are kept in cents so totals are exact. Rows without a date (e.g.
+    a statement's footer) are not kept.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_LEDGER) -> None:
+        self._conn = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self._conn.executescript(_LEDGER_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> Ledger:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(self, account: str, rows: Iterable, keys: Iterable[str] | None = None) -> int:
+        """Add YNAB *rows* (Date, Payee, Memo, Outflow, Inflow) of *account*; return how many were new.
+
+        *keys* are the rows' transaction keys (default: :func:`record_keys`).
+        """
+        rows = [list(r) for r in rows]
+        keys = record_keys(rows) if keys is None else [str(k) for k in keys]
+        values = []
+        for (date, payee, memo, outflow, inflow), key in zip(rows, keys):
+            m = _MDY.match(_ledger_text(date) or "")
+            if m is None:
+                continue
+            month, day, year = m.groups()
+            values.append((
+                f"{year}-{month}", account, key, f"{year}-{month}-{day}",
+                _ledger_text(payee), _ledger_text(memo), _cents(outflow), _cents(inflow),
+            ))
+        cur = self._conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            before = self._conn.total_changes
+            cur.executemany("INSERT OR IGNORE INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+            added = self._conn.total_changes - before
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        return added
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM ledger").fetchone()[0]
+
+    def months(self) -> list[tuple[str, int]]:
+        """Return ``(YYYY-MM, transactions)`` for every month in the ledger."""
+        return self._conn.execute("SELECT month, COUNT(*) FROM ledger GROUP BY month ORDER BY month").fetchall()
+
+    def _where(self, start: str | None, end: str | None, accounts: Iterable[str] | None,
+               payee: str | None = None) -> tuple[str, list]:
+        first, last = _date_bounds(start, end)
+        sql = "month BETWEEN ? AND ? AND date BETWEEN ? AND ?"
+        params: list = [first[:7], last[:7], first, last]
+        accounts = list(accounts or [])
+        if accounts:
+            # A bare converter name ("boc") stands for all of its accounts.
+            clauses = []
+            for account in accounts:
+                if ":" in account:
+                    clauses.append("account = ?")
+                    params.append(account)
+                else:
+                    clauses.append("account = ? OR account GLOB ?")
+                    params += [account, f"{account}:*"]
+            sql += f" AND ({' OR '.join(clauses)})"
+        if payee:
+            sql += " AND payee LIKE ?"
+            params.append(f"%{payee}%")
+        return sql, params
+
+    def rows(self, start: str | None = None, end: str | None = None,
+             accounts: Iterable[str] | None = None) -> Iterator[list[str]]:
+        """Yield YNAB rows dated *start*..*end* (inclusive; ``YYYY[-MM[-DD]]``), oldest first."""
+        where, params = self._where(start, end, accounts)
+        for date, payee, memo, outflow, inflow in self._conn.execute(
+            f"SELECT date, payee, memo, outflow, inflow FROM ledger WHERE {where} "
+            f"ORDER BY date, account, key",
+            params,
+        ):
+            yield [f"{date[5:7]}/{date[8:10]}/{date[:4]}", payee or "", memo or "", _amount(outflow), _amount(inflow)]
+
+    def export(self, outfile: str | Path, start: str | None = None, end: str | None = None,
+               accounts: Iterable[str] | None = None) -> int:
+        """Write the YNAB CSV of *start*..*end* to *outfile*; return the number of rows."""
+        rows = list(self.rows(start, end, accounts))
+        write_csv(outfile, rows)
+        return len(rows)
+
+    def totals(self, by: str = "month", start: str | None = None, end: str | None = None,
+               accounts: Iterable[str] | None = None, payee: str | None = None) -> list[tuple]:
+        """Return ``(group, transactions, outflow, inflow)`` per *by* (see :data:`LEDGER_GROUPS`).
+
+        *payee* keeps only payees containing that text (case-insensitive for
+        ASCII). Outflow and inflow are in currency units.
+        """
+        where, params = self._where(start, end, accounts, payee)
+        group = LEDGER_GROUPS[by]
+        order = "SUM(outflow) DESC" if by == "payee" else "1"
+        return [
+            (name, count, (outflow or 0) / 100, (inflow or 0) / 100)
+            for name, count, outflow, inflow in self._conn.execute(
+                f"SELECT {group}, COUNT(*), SUM(outflow), SUM(inflow) FROM ledger WHERE {where} "
+                f"GROUP BY 1 ORDER BY {order}",
+                params,
+            )
+        ]
+
+
+def pop_ledger_option(argv: list[str]) -> Ledger | None:
+    """Remove ``--ledger[=FILE]`` from *argv* and open that ledger, if it was given."""
+    for arg in list(argv):
+        if arg == "--ledger" or arg.startswith("--ledger="):
+            argv.remove(arg)
+            return Ledger(arg.partition("=")[2] or DEFAULT_LEDGER)
+    return None
@@ -0,0 +1,12 @@
+@echo off
+setlocal
+
+REM Exports and totals the transactions kept in the YNAB ledger (see batch2ynab.bat --ledger).
+REM Usage: ynab_ledger.bat add ^<dir^|glob^|file^> ...
+REM        ynab_ledger.bat export [--from DATE] [--to DATE] -o out.csv
+REM        ynab_ledger.bat totals [--by month^|year^|account^|payee] [--payee TEXT] [--from DATE] [--to DATE]
+REM        ynab_ledger.bat months
+REM This script simply calls the Python script ynab_ledger.py with the provided arguments.
+
+uv run "%~dp0ynab_ledger.py" %*
+exit /b %errorlevel%
@@ -0,0 +1,156 @@
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#   "pandas>=2.0,<3",
+#   "openpyxl>=3",
+#   "xlrd>=2.0.1",
+# ]
+# ///
+"""
+ynab_ledger.py – Query the ledger of every transaction the ``*2ynab.py`` converters produced
+
+The converters append their normalised rows to a :class:`~ynab_common.Ledger`
+(``--ledger``), an SQLite file partitioned by month. Once a statement is in
+it, the xlsx is never needed again:
+
+``add``
+    append old statements to the ledger without writing any CSV (a backfill);
+``export``
+    write the YNAB CSV of a date range, e.g. one month to import again;
+``totals``
+    outflow and inflow per month, year, account or payee, optionally only
+    for payees containing some text ("what did I spend at X since 2023");
+``months``
+    the months the ledger holds, with their transaction counts.
+
+Dates are ``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD``; ranges are inclusive.
+
+Usage
+-----
+python ynab_ledger.py [--ledger FILE] [--profile[=FILE]] <command> ...
+
+python ynab_ledger.py add <dir|glob|file> ...
+python ynab_ledger.py export [--from DATE] [--to DATE] [--account boc,...] -o out.csv
+python ynab_ledger.py totals [--by month|year|account|payee] [--payee TEXT] [--from DATE] [--to DATE] [--account ...]
+python ynab_ledger.py months
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import instrument
+from batch2ynab import CONVERTERS, _expand_inputs
+from instrument import stage
+from ynab_common import DEFAULT_LEDGER, LEDGER_GROUPS, Ledger, check_date_bound, sniff
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Commands
+# ──────────────────────────────────────────────────────────────────────────────
+
+def add(ledger: Ledger, inputs: list[str]) -> int:
+    """Append the statements named by *inputs* to *ledger*; return the exit code."""
+    files = _expand_inputs(inputs)
+    if not files:
+        print("No .xls/.xlsx statements found.", file=sys.stderr)
+        return 1
+    failed = 0
+    for infile in files:
+        start = time.perf_counter()
+        try:
+            with stage("sniff"):
+                kind, sheet = sniff(infile)
+            before = ledger.count()
+            CONVERTERS[kind](str(infile), os.devnull, rows=sheet, ledger=ledger)
+        except Exception as exc:  # noqa: BLE001 – report and keep going
+            failed += 1
+            print(f"FAIL  {infile.name}: {type(exc).__name__}: {exc}")
+            continue
+        added = ledger.count() - before
+        print(f"OK    {infile.name} [{kind}]: {added} new transactions ({time.perf_counter() - start:.2f} s)")
+    return 1 if failed else 0
+
+
+def export(ledger: Ledger, args: argparse.Namespace) -> int:
+    start = time.perf_counter()
+    with stage("export"):
+        rows = ledger.export(args.output, args.start, args.end, args.account)
+    print(f"Wrote {rows} transactions to {args.output} in {time.perf_counter() - start:.3f} s")
+    return 0
+
+
+def totals(ledger: Ledger, args: argparse.Namespace) -> int:
+    start = time.perf_counter()
+    with stage("totals"):
+        groups = ledger.totals(args.by, args.start, args.end, args.account, args.payee)
+    width = max([len(args.by), *(len(str(name)) for name, *_ in groups)])
+    print(f"{args.by:<{width}}  {'count':>7}  {'outflow':>12}  {'inflow':>12}")
+    for name, count, outflow, inflow in groups:
+        print(f"{str(name):<{width}}  {count:>7}  {outflow:>12,.2f}  {inflow:>12,.2f}")
+    count = sum(g[1] for g in groups)
+    outflow = sum(g[2] for g in groups)
+    inflow = sum(g[3] for g in groups)
+    print(f"{'total':<{width}}  {count:>7}  {outflow:>12,.2f}  {inflow:>12,.2f}")
+    print(f"({time.perf_counter() - start:.3f} s)", file=sys.stderr)
+    return 0
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CLI wrapper
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _csv_list(text: str) -> list[str]:
+    return [v for v in text.split(",") if v]
+
+
+def _date_bound(text: str) -> str:
+    try:
+        return check_date_bound(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export and total the transactions in the YNAB ledger.")
+    parser.add_argument("--ledger", type=Path, default=DEFAULT_LEDGER, help=f"Ledger file (default: {DEFAULT_LEDGER})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    span = argparse.ArgumentParser(add_help=False)
+    span.add_argument("--from", dest="start", type=_date_bound, help="First date: YYYY, YYYY-MM or YYYY-MM-DD")
+    span.add_argument("--to", dest="end", type=_date_bound, help="Last date (inclusive): YYYY, YYYY-MM or YYYY-MM-DD")
+    span.add_argument("--account", type=_csv_list,
+                      help="Comma-separated accounts: boc, boccredit or mpay for all of theirs, "
+                           "or one account such as boc:12-34-56-789012 (see 'totals --by account')")
+
+    adder = sub.add_parser("add", help="Append statements to the ledger without writing CSVs")
+    adder.add_argument("inputs", nargs="+", help="Statement files, directories or glob patterns")
+
+    exp = sub.add_parser("export", parents=[span], help="Write the YNAB CSV of a date range")
+    exp.add_argument("-o", "--output", type=Path, required=True, help="CSV file to write")
+
+    tot = sub.add_parser("totals", parents=[span], help="Outflow and inflow per month, year, account or payee")
+    tot.add_argument("--by", choices=LEDGER_GROUPS, default="month", help="Grouping (default: month)")
+    tot.add_argument("--payee", help="Only payees containing this text")
+
+    sub.add_parser("months", help="List the months in the ledger")
+
+    instrument.setup(argv)
+    args = parser.parse_args(argv)
+
+    with Ledger(args.ledger) as ledger:
+        if args.command == "add":
+            return add(ledger, args.inputs)
+        if args.command == "export":
+            return export(ledger, args)
+        if args.command == "totals":
+            return totals(ledger, args)
+        for month, count in ledger.months():
+            print(f"{month}  {count:>7}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())